@@ -0,0 +1,111 @@
+import re
+import threading
+from collections import OrderedDict
+
+# Questions whose term overlap with a cached question reaches this are answered from the cache
+SIMILARITY_THRESHOLD = 0.8
+MAX_ENTRIES = 5000
+
+PUNCTUATION = re.compile(r"[^a-z0-9' ]+")
+WORD = re.compile(r"[a-z0-9']+")
+
+# Unlike the BM25 stopwords, question words and negations are kept: they decide what is
+# being asked, so two questions only share an answer if these terms are exactly the same
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'did', 'do', 'does', 'for', 'from', 'has',
+    'have', 'he', 'her', 'his', 'i', 'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or', 'our',
+    'she', 'so', 'that', 'the', 'their', 'them', 'there', 'they', 'this', 'to', 'was', 'we', 'were',
+    'will', 'with', 'you', 'your',
+}
+INTERROGATIVES = {'what', 'when', 'where', 'which', 'who', 'whom', 'whose', 'why', 'how'}
+NEGATIONS = {'not', 'no', 'never', 'none', 'nothing', 'nobody', 'without'}
+REQUIRED = INTERROGATIVES | NEGATIONS
+
+
+def normalize_question(question):
+    return " ".join(PUNCTUATION.sub(" ", question.lower()).split())
+
+
+def question_terms(question):
+    # Light stemming so "topics"/"topic" and "explained"/"explain" compare equal
+    terms = set()
+    for word in WORD.findall(question.lower()):
+        if word.endswith("n't") or word == 'cannot':
+            terms.add('not')
+            continue
+        if word in STOPWORDS:
+            continue
+        for suffix in ("'s", 'ing', 'ed', 's'):
+            if len(word) > len(suffix) + 2 and word.endswith(suffix):
+                word = word[:-len(suffix)]
+                break
+        terms.add(word)
+    return frozenset(terms)
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    # "When did ..." never answers "Why did ...", however much else the questions share
+    if a & REQUIRED != b & REQUIRED:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class AnswerCache:
+    def __init__(self, max_entries=MAX_ENTRIES, threshold=SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        # (session_id, normalized question) -> (terms, answer), least recently used first
+        self.entries = OrderedDict()
+        # session_id -> keys of its entries, so lookups only scan one session
+        self.sessions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id, question):
+        normalized = normalize_question(question)
+        with self.lock:
+            key = (session_id, normalized)
+            if key not in self.entries:
+                # Fall back to the closest cached question for this session
+                terms = question_terms(normalized)
+                best, best_score = None, self.threshold
+                for candidate in self.sessions.get(session_id, ()):
+                    score = similarity(terms, self.entries[candidate][0])
+                    if score >= best_score:
+                        best, best_score = candidate, score
+                key = best
+            if key is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][1]
+
+    def put(self, session_id, question, answer):
+        # An empty answer would be served to every similar question
+        if not answer or not answer.strip():
+            return
+        normalized = normalize_question(question)
+        key = (session_id, normalized)
+        with self.lock:
+            self.entries[key] = (question_terms(normalized), answer)
+            self.entries.move_to_end(key)
+            self.sessions.setdefault(session_id, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                old_key, _ = self.entries.popitem(last=False)
+                keys = self.sessions[old_key[0]]
+                keys.discard(old_key)
+                if not keys:
+                    del self.sessions[old_key[0]]
+
+    def invalidate(self, session_id):
+        with self.lock:
+            for key in self.sessions.pop(session_id, ()):
+                del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'sessions': len(self.sessions), 'hits': self.hits, 'misses': self.misses}
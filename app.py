@@ -1,31 +1,44 @@
-from flask import Flask, request, jsonify, session, send_file, send_from_directory
+from flask import Flask, request, jsonify, session, Response, stream_with_context
 from flask_cors import CORS
+from media_serving import serve_media
 import sqlite3
 import os
 import uuid
 import datetime
 import hashlib
+import copy
 import json
+from werkzeug.http import http_date
 from werkzeug.utils import secure_filename
 import yt_dlp
-import google.generativeai as genai
-import ffmpeg
-import faster_whisper
+from transcription import select_backend, default_processes, transcribe_file, preload_transcriber, media_duration
+from retrieval import index_segments, search, format_chunks
+from segments import SegmentTable
+from summarization import summarize, STYLES, DEFAULT_STYLE
+from llm import create_client, LLMBusyError
+from answer_cache import AnswerCache, MAX_ENTRIES, SIMILARITY_THRESHOLD
 import re
-import io
-from datetime import timedelta
-import aiohttp
-import aiofiles
 from cachetools import TTLCache
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, event
 from concurrent.futures import ThreadPoolExecutor
+from migrations import configure_connection, migrate
+import blob_store
+from blob_store import TRANSCRIPT, SUMMARY, SEGMENTS, INDEX
+import search_index
+from pagination import page_size, decode_cursor, split_page, parse_timestamp, page_response
 import asyncio
+import threading
+import time
+import zlib
+import resumable
+import media_store
+import youtube_cache
+import single_flight
+from single_flight import SingleFlight
+from contextlib import ExitStack
 
-# Configure Gemini API key
-genai.configure(api_key=os.environ.get('GOOGLE_API_KEY'))
-
-# Initialize Gemini 1.5 Flash model
-model = genai.GenerativeModel("gemini-1.5-flash")
+# Shared LLM client (Gemini 1.5 Flash by default); bounds concurrency and retries transient errors
+llm = create_client()
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -40,12 +53,78 @@ ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
 # Create database engine with connection pooling
 engine = create_engine(f'sqlite:///{DATABASE}', pool_size=5, max_overflow=10)
 
-# Cache for transcripts and summaries (TTL: 1 hour)
+@event.listens_for(engine, "connect")
+def on_connect(dbapi_connection, connection_record):
+    # WAL, synchronous=NORMAL and mmap for every pooled connection
+    configure_connection(dbapi_connection)
+
+# Cache for summaries (TTL: 1 hour)
 cache = TTLCache(maxsize=100, ttl=3600)
 
+# Per-chunk summaries of long transcripts, reused when a summary is regenerated in another style
+chunk_summary_cache = TTLCache(maxsize=2000, ttl=24 * 3600)
+SUMMARY_CONCURRENCY = int(os.environ.get('SUMMARY_CONCURRENCY', 4))
+
+# Identical in-flight work (same media hash or YouTube id) runs once; other jobs wait for it,
+# whether they run in this process or another one
+flights = SingleFlight(engine)
+
+# Transcripts are cached on disk by content hash so re-uploads and restarts hit it
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.environ.get('TRANSCRIPT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Number of transcript excerpts sent with each question
+ASK_TOP_K = int(os.environ.get('ASK_TOP_K', 5))
+ANSWER_ERROR = "Error in processing your question."
+SUMMARY_ERROR = "Error in summarization process."
+
+# Answers to earlier questions, reused for repeated or near-identical questions on the same session
+answer_cache = AnswerCache(int(os.environ.get('ANSWER_CACHE_SIZE', MAX_ENTRIES)),
+                           float(os.environ.get('ANSWER_CACHE_THRESHOLD', SIMILARITY_THRESHOLD)))
+
 # Thread pool for CPU-bound tasks
 executor = ThreadPoolExecutor(max_workers=4)
 
+# Whisper model settings; the model itself is loaded once and shared via the registry
+WHISPER_MODEL_SIZE = os.environ.get('WHISPER_MODEL_SIZE', 'base')
+WHISPER_PRELOAD = os.environ.get('WHISPER_PRELOAD', '1') == '1'
+# Spoken language passed to Whisper, stored with cached YouTube results
+TRANSCRIBE_LANGUAGE = os.environ.get('TRANSCRIBE_LANGUAGE', 'en')
+
+# Word-level timings are stored with each segment when enabled (slower decoding)
+WHISPER_WORD_TIMESTAMPS = os.environ.get('WHISPER_WORD_TIMESTAMPS', '0') == '1'
+
+# Device, compute type and threading are picked from the hardware in startup() unless overridden
+TRANSCRIPTION_BACKEND = None
+
+# Worker processes for chunked transcription of long videos (1 = transcribe in-process)
+TRANSCRIBE_PROCESSES = 1
+
+# Transcription only needs 16 kHz mono audio, so YouTube jobs fetch the smallest
+# audio-only stream; the video itself is downloaded only for local playback
+YOUTUBE_AUDIO_FORMAT = os.environ.get('YOUTUBE_AUDIO_FORMAT', 'worstaudio[acodec!=none]/worstaudio/worst')
+YOUTUBE_VIDEO_FORMAT = 'best[ext=mp4]'
+# auto = keep a local video copy only when YouTube disallows embedding; always; never
+YOUTUBE_LOCAL_VIDEO = os.environ.get('YOUTUBE_LOCAL_VIDEO', 'auto').lower()
+
+# Background workers for /process jobs; jobs live in the job table so they survive restarts
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_POLL_INTERVAL = 2
+JOB_STALE_SECONDS = 600
+JOB_HEARTBEAT_SECONDS = 60
+job_event = threading.Event()
+
+# Resumable uploads: largest accepted file, and how long a PATCH may hold an upload
+# before another request can take it over. An open upload expires (with its partial
+# file) once it has gone UPLOAD_EXPIRE_SECONDS without a PATCH; a sweeper removes it
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 20 * 1024 ** 3))
+UPLOAD_LOCK_SECONDS = 600
+UPLOAD_EXPIRE_SECONDS = int(os.environ.get('UPLOAD_EXPIRE_SECONDS', 86400))
+UPLOAD_SWEEP_SECONDS = 3600
+
+# Server-Sent Events: how long a stream waits for new events before checking the job row
+SSE_POLL_SECONDS = 1
+JOB_CHANNEL_TTL = 300
+
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
@@ -73,6 +152,7 @@ def init_db():
             youtube_id VARCHAR(50),
             transcript TEXT,
             summary TEXT,
+            transcription_backend TEXT,
             FOREIGN KEY (user_id) REFERENCES user(id)
         )
         '''))
@@ -88,6 +168,63 @@ def init_db():
         )
         '''))
         
+        conn.execute(text('''
+        CREATE TABLE IF NOT EXISTS transcript_cache (
+            media_hash VARCHAR(64) NOT NULL,
+            model VARCHAR(50) NOT NULL,
+            language VARCHAR(10) NOT NULL,
+            word_timestamps BOOLEAN NOT NULL DEFAULT 0,
+            transcript TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_access DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (media_hash, model, language)
+        )
+        '''))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_transcript_cache_last_access ON transcript_cache (last_access)"))
+        
+        conn.execute(text('''
+        CREATE TABLE IF NOT EXISTS job (
+            id VARCHAR(100) PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            session_id VARCHAR(100) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            stage VARCHAR(20) NOT NULL DEFAULT 'queued',
+            progress INTEGER NOT NULL DEFAULT 0,
+            payload TEXT NOT NULL,
+            error TEXT,
+            claimed_by VARCHAR(100),
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES user(id)
+        )
+        '''))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_job_status ON job (status, created_at)"))
+        
+        conn.execute(text('''
+        CREATE TABLE IF NOT EXISTS upload (
+            id VARCHAR(100) PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            session_id VARCHAR(100) NOT NULL,
+            filename VARCHAR(200) NOT NULL,
+            title VARCHAR(200) NOT NULL,
+            path VARCHAR(300) NOT NULL,
+            size INTEGER NOT NULL,
+            offset INTEGER NOT NULL DEFAULT 0,
+            status VARCHAR(20) NOT NULL DEFAULT 'open',
+            locked_until REAL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES user(id)
+        )
+        '''))
+        
+        blob_store.create_table(conn)
+        search_index.create_table(conn)
+        media_store.create_table(conn)
+        youtube_cache.create_table(conn)
+        single_flight.create_table(conn)
+        
         conn.execute(text('''
         CREATE TABLE IF NOT EXISTS contact_message (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -107,8 +244,53 @@ def init_db():
                         {'username': 'Admin', 'email': 'admin@example.com', 'password': hashed_password, 'is_admin': 1})
         
         conn.commit()
+    
+    # Versioned schema changes (indexes, denormalized counts) on top of the base tables
+    raw = engine.raw_connection()
+    try:
+        migrate(raw)
+    finally:
+        raw.close()
+    
+    with engine.connect() as conn:
+        moved = blob_store.move_session_texts(conn)
+    if moved:
+        print(f"Moved transcripts and summaries of {moved} sessions to the blob store")
+
+def load_segments(conn, session_id):
+    # Sessions from before segment storage only have the formatted transcript
+    data = blob_store.get_text(conn, session_id, SEGMENTS)
+    if data is None:
+        data = blob_store.get_text(conn, session_id, TRANSCRIPT)
+    return SegmentTable.loads(data)
+
+def index_session_segments(conn, session_id, user_id, segments):
+    search_index.index_segments(conn, session_id, user_id, segments)
+    conn.execute(text("UPDATE session SET search_indexed = 1 WHERE id = :id"), {'id': session_id})
+
+def backfill_search_index():
+    # Sessions processed before full-text search existed, a batch at a time
+    try:
+        with engine.connect() as conn:
+            while True:
+                rows = conn.execute(text("SELECT id, user_id FROM session WHERE search_indexed = 0 LIMIT :limit"),
+                                    {'limit': search_index.BACKFILL_BATCH}).mappings().fetchall()
+                if not rows:
+                    return
+                for row in rows:
+                    index_session_segments(conn, row['id'], row['user_id'], load_segments(conn, row['id']))
+                conn.commit()
+    except Exception as e:
+        print(f"Search index backfill error: {e}")
 
-init_db()
+def warm_answer_cache():
+    # Replay the most recent conversations oldest first so they end up most recently used
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT session_id, question, answer FROM conversation ORDER BY id DESC LIMIT :limit"),
+                            {'limit': answer_cache.max_entries}).mappings().fetchall()
+    for row in reversed(rows):
+        if row['answer'] and row['answer'] != ANSWER_ERROR:
+            answer_cache.put(row['session_id'], row['question'], row['answer'])
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -123,104 +305,499 @@ def is_admin():
             return user and user['is_admin'] == 1
     return False
 
-async def check_youtube_video(youtube_url):
-    ydl_opts = {
-        'format': 'best[ext=mp4]',
-        'simulate': True,
-        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'quiet': True,
-    }
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.extract_info(youtube_url, download=False)
-            return True
-    except Exception as e:
-        print(f"Video availability check failed: {e}")
-        return False
-
-async def download_youtube_video(youtube_url, cookies_file=None):
+def youtube_options(cookies_file=None, on_progress=None, **options):
     ydl_opts = {
-        'format': 'best[ext=mp4]',
-        'outtmpl': os.path.join(UPLOAD_FOLDER, '%(id)s.%(ext)s'),
         'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'sleep_interval': 1,
         'max_sleep_interval': 5,
         'quiet': True,
-        'no_warnings': True
+        'no_warnings': True,
+        **options
     }
     if cookies_file and os.path.exists(cookies_file):
         ydl_opts['cookiefile'] = cookies_file
+    if on_progress:
+        def progress_hook(d):
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            if d.get('status') == 'downloading' and total:
+                on_progress(d.get('downloaded_bytes', 0) / total)
+        ydl_opts['progress_hooks'] = [progress_hook]
+    return ydl_opts
+
+def extract_youtube_info(youtube_url, cookies_file=None):
+    # The only metadata request per video: it fails for private, restricted or missing
+    # videos, and the downloads below select formats from its result
+    try:
+        with yt_dlp.YoutubeDL(youtube_options(cookies_file)) as ydl:
+            return ydl.extract_info(youtube_url, download=False, process=False)
+    except Exception as e:
+        print(f"Video availability check failed: {e}")
+        return None
+
+def download_youtube_media(info, media_format, outtmpl, cookies_file=None, on_progress=None):
+    ydl_opts = youtube_options(cookies_file, on_progress, format=media_format,
+                               outtmpl=os.path.join(UPLOAD_FOLDER, outtmpl))
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(youtube_url, download=True)
-            video_id = info.get('id', '')
-            title = info.get('title', 'Untitled Video')
-            filename = f"{video_id}.mp4"
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            return {
-                'video_id': video_id,
-                'title': title,
-                'filepath': filepath
-            }
+            result = ydl.process_ie_result(copy.deepcopy(info), download=True)
+            downloads = result.get('requested_downloads') or [{}]
+            return downloads[0].get('filepath') or ydl.prepare_filename(result)
     except Exception as e:
         print(f"Unexpected error: {e}")
         return None
 
-def transcribe_video(file_path):
-    cache_key = f"transcript_{file_path}"
-    if cache_key in cache:
-        return cache[cache_key]
-    
+def needs_local_video(info):
+    # The player embeds YouTube; a local copy is only fetched when embedding is disabled
+    if YOUTUBE_LOCAL_VIDEO == 'always':
+        return True
+    return YOUTUBE_LOCAL_VIDEO == 'auto' and info.get('playable_in_embed') is False
+
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def get_cached_transcript(media_hash):
+    with engine.connect() as conn:
+        key = {'hash': media_hash, 'model': WHISPER_MODEL_SIZE, 'language': TRANSCRIBE_LANGUAGE}
+        # Entries with word timings also serve requests without them, not the other way round
+        row = conn.execute(text('''
+        SELECT transcript FROM transcript_cache
+        WHERE media_hash = :hash AND model = :model AND language = :language AND word_timestamps >= :word_timestamps
+        '''), {**key, 'word_timestamps': WHISPER_WORD_TIMESTAMPS}).mappings().fetchone()
+        if not row:
+            return None
+        conn.execute(text('''
+        UPDATE transcript_cache SET last_access = CURRENT_TIMESTAMP
+        WHERE media_hash = :hash AND model = :model AND language = :language
+        '''), key)
+        conn.commit()
+        return SegmentTable.loads(row['transcript'])
+
+def cache_transcript(media_hash, segments):
+    transcript = segments.dumps()
+    with engine.connect() as conn:
+        conn.execute(text('''
+        INSERT OR REPLACE INTO transcript_cache (media_hash, model, language, word_timestamps, transcript, size)
+        VALUES (:hash, :model, :language, :word_timestamps, :transcript, :size)
+        '''), {'hash': media_hash, 'model': WHISPER_MODEL_SIZE, 'language': TRANSCRIBE_LANGUAGE,
+              'word_timestamps': any(segments.words), 'transcript': transcript, 'size': len(transcript.encode())})
+        # Evict least recently used entries once the cache grows past its size budget
+        conn.execute(text('''
+        DELETE FROM transcript_cache WHERE rowid IN (
+            SELECT rowid FROM (
+                SELECT rowid, SUM(size) OVER (ORDER BY last_access DESC, rowid DESC) AS running
+                FROM transcript_cache
+            ) WHERE running > :max_bytes
+        )
+        '''), {'max_bytes': TRANSCRIPT_CACHE_MAX_BYTES})
+        conn.commit()
+
+def find_session_transcript(media_hash):
+    # Another session already holds a transcript of the same bytes from the same model and
+    # language; unlike transcript_cache it is never evicted while that session exists.
+    # Sessions that don't record a language were transcribed in English
+    with engine.connect() as conn:
+        row = conn.execute(text('''
+        SELECT id FROM session
+        WHERE media_hash = :hash AND json_extract(transcription_backend, '$.model') = :model
+          AND COALESCE(json_extract(transcription_backend, '$.language'), 'en') = :language
+          AND COALESCE(json_extract(transcription_backend, '$.word_timestamps'), 0) >= :word_timestamps
+        ORDER BY timestamp DESC LIMIT 1
+        '''), {'hash': media_hash, 'model': WHISPER_MODEL_SIZE, 'language': TRANSCRIBE_LANGUAGE,
+              'word_timestamps': WHISPER_WORD_TIMESTAMPS}).fetchone()
+        if not row:
+            return None
+        segments = load_segments(conn, row[0])
+        return segments if len(segments) else None
+
+def stored_transcript(media_hash):
+    segments = get_cached_transcript(media_hash)
+    if segments is None:
+        segments = find_session_transcript(media_hash)
+        if segments is not None:
+            cache_transcript(media_hash, segments)
+    return segments
+
+def transcript_variant():
+    # Decode options that change the stored transcript; part of the single-flight keys
+    return f"{TRANSCRIBE_LANGUAGE}:{'words' if WHISPER_WORD_TIMESTAMPS else 'segments'}"
+
+def report_segments(segments, duration, on_progress=None, on_segment=None):
+    for segment in segments:
+        if on_progress and duration:
+            on_progress(min(1.0, segment['end'] / duration))
+        if on_segment:
+            on_segment(segment)
+        yield segment
+
+def transcribe_video(file_path, media_hash=None, on_progress=None, on_segment=None, on_wait=None):
     try:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Video file not found: {file_path}")
 
-        # Extract audio using FFmpeg with GPU acceleration
-        output_audio = io.BytesIO()
-        stream = ffmpeg.input(file_path).output('pipe:', format='wav', acodec='pcm_s16le', ar=16000, loglevel='quiet')
-        audio_data, _ = ffmpeg.run(stream, capture_stdout=True)
-        output_audio.write(audio_data)
-        output_audio.seek(0)
-
-        # Load faster-whisper model with CUDA
-        whisper_model = faster_whisper.WhisperModel(model_size_or_path="base", device="cuda", compute_type="float16")
-
-        # Transcribe audio
-        segments, _ = whisper_model.transcribe(output_audio, language='en')
-        transcript = "\n".join(
-            f"[{str(timedelta(seconds=int(segment.start)))} - {str(timedelta(seconds=int(segment.end)))}] {segment.text.strip()}"
-            for segment in segments
-        )
-
-        # Cache the transcript
-        cache[cache_key] = transcript if transcript.strip() else "No transcription available."
-        return cache[cache_key]
+        media_hash = media_hash or file_hash(file_path)
+        # The same bytes being transcribed elsewhere are waited for, then read from the cache
+        with flights.hold(f"media:{media_hash}:{transcript_variant()}", lambda: stored_transcript(media_hash), on_wait) as stored:
+            if stored is not None:
+                return stored
+            return transcribe_new(file_path, media_hash, on_progress, on_segment)
     except Exception as e:
         print(f"Transcription error: {e}")
-        return "Error in transcription process."
+        return None
+
+def transcribe_new(file_path, media_hash, on_progress=None, on_segment=None):
+    # Stream audio out of FFmpeg in silence-aligned chunks, transcribed in
+    # parallel by the worker processes and stitched back in order
+    segments = transcribe_file(file_path, WHISPER_MODEL_SIZE, TRANSCRIPTION_BACKEND, TRANSCRIBE_PROCESSES, language=TRANSCRIBE_LANGUAGE,
+                               word_timestamps=WHISPER_WORD_TIMESTAMPS)
+    if on_progress or on_segment:
+        segments = report_segments(segments, media_duration(file_path) if on_progress else None, on_progress, on_segment)
+    # Kept as a segment table; the formatted transcript is rendered when needed
+    table = SegmentTable.from_segments(segments)
+
+    # Cache the transcript
+    cache_transcript(media_hash, table)
+    return table
+
+def generate_text(prompt, on_text=None):
+    # Summaries run in the background, so they queue for a slot rather than fail fast;
+    # with on_text the text is streamed so listeners see it as it is generated
+    return llm.generate(prompt, max_output_tokens=500, on_text=on_text, block=True)
 
-def summarize_text(transcript):
-    cache_key = f"summary_{hashlib.md5(transcript.encode()).hexdigest()}"
+def summarize_text(transcript, on_text=None, style=DEFAULT_STYLE):
+    cache_key = f"summary_{style}_{hashlib.md5(transcript.encode()).hexdigest()}"
     if cache_key in cache:
+        if on_text:
+            on_text(cache[cache_key])
         return cache[cache_key]
     
     try:
-        prompt = f"You are a helpful assistant that provides concise and informative summaries of video content. Please provide a summary of the following transcript:\n\n{transcript}"
-        response = model.generate_content(prompt, generation_config={"max_output_tokens": 500})
-        cache[cache_key] = response.text
+        # Long transcripts are summarized in chunks in parallel, then reduced
+        cache[cache_key] = summarize(transcript, generate_text, style, chunk_cache=chunk_summary_cache,
+                                     concurrency=SUMMARY_CONCURRENCY, on_text=on_text)
         return cache[cache_key]
     except Exception as e:
         print(f"Summarization error: {e}")
-        return "Error in summarization process."
+        return SUMMARY_ERROR
 
-def answer_question(transcript, question):
+def answer_prompt(excerpts, question):
+    return f"You are a helpful assistant that answers questions based on video transcripts. Based on the following transcript excerpts (with their timestamps), please answer this question: '{question}'\n\nTranscript excerpts:\n{excerpts}"
+
+def save_session_index(conn, session_id, index):
+    blob_store.put_text(conn, session_id, INDEX, json.dumps(index))
+
+def load_session_index(conn, session_id):
+    cache_key = f"index_{session_id}"
+    if cache_key in cache:
+        return cache[cache_key]
+    
+    data = blob_store.get_text(conn, session_id, INDEX)
+    if data is not None:
+        index = json.loads(data)
+    else:
+        # Sessions processed before indexing existed are indexed on first question
+        index = index_segments(load_segments(conn, session_id))
+        save_session_index(conn, session_id, index)
+        conn.commit()
+    cache[cache_key] = index
+    return index
+
+def question_context(conn, session_id, question):
+    # Only the most relevant timestamped chunks go into the prompt
+    return format_chunks(search(load_session_index(conn, session_id), question, ASK_TOP_K))
+
+def answer_question(excerpts, question):
     try:
-        prompt = f"You are a helpful assistant that answers questions based on video transcripts. Based on the following transcript, please answer this question: '{question}'\n\nTranscript: {transcript}"
-        response = model.generate_content(prompt, generation_config={"max_output_tokens": 500})
-        return response.text
+        return llm.generate(answer_prompt(excerpts, question), max_output_tokens=500)
+    except LLMBusyError:
+        raise
     except Exception as e:
         print(f"Question answering error: {e}")
-        return "Error in processing your question."
+        return ANSWER_ERROR
+
+def stream_answer(excerpts, question):
+    yield from llm.stream(answer_prompt(excerpts, question), max_output_tokens=500)
+
+def save_conversation(session_id, question, answer):
+    with engine.connect() as conn:
+        conn.execute(text('''
+        INSERT INTO conversation (session_id, question, answer)
+        VALUES (:session_id, :question, :answer)
+        '''), {'session_id': session_id, 'question': question, 'answer': answer})
+        conn.commit()
+        
+        return conn.execute(text("SELECT last_insert_rowid()")).fetchone()[0]
+
+class JobChannel:
+    # Events published by the worker running a job, replayed to every subscriber
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.events = []
+        self.finished = False
+
+    def publish(self, event, data):
+        with self.condition:
+            self.events.append((event, data))
+            if event in ('done', 'failed'):
+                self.finished = True
+            self.condition.notify_all()
+
+    def wait(self, index, timeout):
+        with self.condition:
+            if index >= len(self.events) and not self.finished:
+                self.condition.wait(timeout)
+            return self.events[index:]
+
+job_channels = {}
+job_channels_lock = threading.Lock()
+
+def open_job_channel(job_id):
+    with job_channels_lock:
+        return job_channels.setdefault(job_id, JobChannel())
+
+def close_job_channel(job_id):
+    # Keep finished channels around briefly so late subscribers still get the replay
+    timer = threading.Timer(JOB_CHANNEL_TTL, lambda: job_channels.pop(job_id, None))
+    timer.daemon = True
+    timer.start()
+
+def sse_event(event, data, event_id=None):
+    message = f"event: {event}\ndata: {json.dumps(data)}\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n" + message
+    return message + "\n"
+
+def insert_job(conn, job_id, user_id, session_id, payload):
+    conn.execute(text('''
+    INSERT INTO job (id, user_id, session_id, payload)
+    VALUES (:id, :user_id, :session_id, :payload)
+    '''), {'id': job_id, 'user_id': user_id, 'session_id': session_id, 'payload': json.dumps(payload)})
+
+def enqueue_job(job_id, user_id, session_id, payload):
+    with engine.connect() as conn:
+        insert_job(conn, job_id, user_id, session_id, payload)
+        conn.commit()
+    job_event.set()
+
+def update_job(job_id, claim=None, **fields):
+    # With claim, only the worker still holding the job can write (returns False otherwise)
+    assignments = ", ".join(f"{name} = :{name}" for name in fields)
+    fence = " AND claimed_by = :claim" if claim else ""
+    with engine.connect() as conn:
+        updated = conn.execute(text(f"UPDATE job SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = :id{fence}"),
+                               {**fields, 'id': job_id, 'claim': claim}).rowcount
+        conn.commit()
+    return updated > 0
+
+def job_heartbeat(job_id, claim, stop):
+    # Stages can go quiet for long (video download, queued summary calls), so the
+    # worker keeps updated_at fresh until process_job returns
+    while not stop.wait(JOB_HEARTBEAT_SECONDS):
+        try:
+            with engine.connect() as conn:
+                conn.execute(text('''
+                UPDATE job SET updated_at = CURRENT_TIMESTAMP
+                WHERE id = :id AND claimed_by = :claim AND status = 'running'
+                '''), {'id': job_id, 'claim': claim})
+                conn.commit()
+        except Exception as e:
+            print(f"Job {job_id} heartbeat error: {e}")
+
+def claim_next_job():
+    with engine.connect() as conn:
+        # Jobs whose worker died (no progress for a while) go back on the queue
+        conn.execute(text('''
+        UPDATE job SET status = 'queued', stage = 'queued'
+        WHERE status = 'running' AND updated_at < datetime('now', :stale)
+        '''), {'stale': f'-{JOB_STALE_SECONDS} seconds'})
+        conn.commit()
+        while True:
+            job = conn.execute(text("SELECT id, payload FROM job WHERE status = 'queued' ORDER BY created_at, rowid LIMIT 1")).mappings().fetchone()
+            if not job:
+                return None
+            # The status check makes the claim atomic across threads and processes; the
+            # token fences the final update if the job is ever requeued under this worker
+            claim = str(uuid.uuid4())
+            claimed = conn.execute(text('''
+            UPDATE job SET status = 'running', stage = 'starting', claimed_by = :claim, updated_at = CURRENT_TIMESTAMP
+            WHERE id = :id AND status = 'queued'
+            '''), {'id': job['id'], 'claim': claim})
+            conn.commit()
+            if claimed.rowcount:
+                return {'id': job['id'], 'claim': claim, 'payload': json.loads(job['payload'])}
+
+def youtube_result(youtube_id):
+    with engine.connect() as conn:
+        entry = youtube_cache.lookup(conn, youtube_id, WHISPER_MODEL_SIZE, TRANSCRIBE_LANGUAGE, WHISPER_WORD_TIMESTAMPS)
+    if entry is not None:
+        entry['segments'] = SegmentTable.loads(entry['segments'])
+    return entry
+
+def download_youtube_video(info, cookies_file=None):
+    video_path = download_youtube_media(info, YOUTUBE_VIDEO_FORMAT, '%(id)s.%(ext)s', cookies_file)
+    if not video_path:
+        raise RuntimeError("Failed to download YouTube video")
+    return os.path.normpath(video_path).replace(os.sep, '/')
+
+def process_job(job_id, payload, channel):
+    last = {}
+
+    def report(stage, progress):
+        progress = int(progress)
+        if last.get('stage') != stage or last.get('progress') != progress:
+            last.update(stage=stage, progress=progress)
+            update_job(job_id, stage=stage, progress=progress)
+            channel.publish('stage', {'stage': stage, 'progress': progress})
+
+    def waiting():
+        # Called now and then while another job produces the same result; always written,
+        # so a long wait doesn't get the job requeued as stale
+        progress = last.get('progress', 0)
+        last.clear()
+        report('waiting', progress)
+
+    def publish_segment(segment):
+        channel.publish('segment', {'start': segment['start'], 'end': segment['end'], 'text': segment['text'].strip()})
+
+    video_path = payload.get('video_path')
+    audio_path = None
+    title = payload.get('title')
+    youtube_id = None
+    media_hash = None
+    cached = None
+    info = None
+    cookies_file = payload.get('cookies_file')
+
+    with ExitStack() as flight:
+        if payload.get('youtube_url'):
+            report('downloading', 0)
+            youtube_id = youtube_cache.video_id(payload['youtube_url'])
+            try:
+                if youtube_id:
+                    # Held until the result is stored, so concurrent jobs for the video wait and reuse it
+                    cached = flight.enter_context(flights.hold(f"youtube:{youtube_id}:{transcript_variant()}",
+                                                               lambda: youtube_result(youtube_id), waiting))
+
+                if cached is not None:
+                    title = cached['title']
+                    video_path = cached['video_path']
+                    if video_path and not os.path.exists(video_path):
+                        video_path = None
+                    # A local copy for the player is only fetched again if it is gone
+                    if needs_local_video(cached) and not video_path:
+                        info = extract_youtube_info(payload['youtube_url'], cookies_file)
+                        if not info:
+                            raise RuntimeError("Video is not accessible (private, restricted, or unavailable)")
+                        video_path = download_youtube_video(info, cookies_file)
+                else:
+                    info = extract_youtube_info(payload['youtube_url'], cookies_file)
+                    if not info:
+                        raise RuntimeError("Video is not accessible (private, restricted, or unavailable)")
+                    audio_path = download_youtube_media(info, YOUTUBE_AUDIO_FORMAT, '%(id)s.audio.%(ext)s', cookies_file,
+                                                        on_progress=lambda fraction: report('downloading', fraction * 20))
+                    if not audio_path:
+                        raise RuntimeError("Failed to download YouTube audio")
+                    if needs_local_video(info):
+                        video_path = download_youtube_video(info, cookies_file)
+                    youtube_id = info.get('id', '')
+                    title = info.get('title', 'Untitled Video')
+            finally:
+                if cookies_file and os.path.exists(cookies_file):
+                    os.remove(cookies_file)
+        else:
+            # Uploads are stored by content hash; resumable uploads hashed the file while it arrived
+            media_hash = payload.get('media_hash') or file_hash(video_path)
+
+        if cached is not None:
+            # Same video already processed for someone: no download, transcription or summary
+            segments = cached['segments']
+            summary = cached['summary']
+            channel.publish('summary', {'text': summary})
+        else:
+            # Audio extraction is streamed inside transcription, so they share a stage
+            report('transcribing', 20)
+            try:
+                segments = transcribe_video(audio_path or video_path, media_hash,
+                                            on_progress=lambda fraction: report('transcribing', 20 + fraction * 60),
+                                            on_segment=publish_segment, on_wait=waiting)
+            finally:
+                # The audio-only download is needed for transcription alone
+                if audio_path and os.path.exists(audio_path):
+                    os.remove(audio_path)
+            if segments is None:
+                raise RuntimeError("Transcription failed")
+            transcript = segments.render()
+
+            report('summarizing', 80)
+            summary = summarize_text(transcript, on_text=lambda delta: channel.publish('summary', {'text': delta}))
+
+        report('saving', 95)
+        upload_path = video_path
+        with engine.connect() as conn:
+            if media_hash:
+                # Identical uploads share one file; this copy is dropped if the content is already stored
+                video_path = media_store.add_reference(conn, UPLOAD_FOLDER, video_path, media_hash)
+            conn.execute(text('''
+            INSERT INTO session (id, user_id, title, is_youtube, video_path, youtube_id, media_hash, transcription_backend)
+            VALUES (:id, :user_id, :title, :is_youtube, :video_path, :youtube_id, :media_hash, :transcription_backend)
+            '''), {
+                'id': payload['session_id'],
+                'user_id': payload['user_id'],
+                'title': title,
+                'is_youtube': bool(payload.get('youtube_url')),
+                'video_path': video_path,
+                'youtube_id': youtube_id,
+                'media_hash': media_hash,
+                'transcription_backend': json.dumps({'model': WHISPER_MODEL_SIZE, 'language': TRANSCRIBE_LANGUAGE,
+                                                     'word_timestamps': any(segments.words), **TRANSCRIPTION_BACKEND})
+            })
+            blob_store.put_text(conn, payload['session_id'], SEGMENTS, segments.dumps())
+            blob_store.put_text(conn, payload['session_id'], SUMMARY, summary)
+            save_session_index(conn, payload['session_id'], index_segments(segments))
+            index_session_segments(conn, payload['session_id'], payload['user_id'], segments)
+            # A failed summary isn't shared; the next submission of the video tries again
+            if youtube_id and cached is None and summary != SUMMARY_ERROR:
+                youtube_cache.store(conn, youtube_id, WHISPER_MODEL_SIZE, title, TRANSCRIBE_LANGUAGE,
+                                    segments.dumps(), summary, info.get('playable_in_embed'), video_path,
+                                    any(segments.words))
+            conn.commit()
+        if media_hash:
+            media_store.place_file(upload_path, video_path)
+
+def job_worker():
+    while True:
+        try:
+            job = claim_next_job()
+        except Exception as e:
+            print(f"Job queue error: {e}")
+            job = None
+        if job is None:
+            job_event.wait(JOB_POLL_INTERVAL)
+            job_event.clear()
+            continue
+        channel = open_job_channel(job['id'])
+        stop = threading.Event()
+        threading.Thread(target=job_heartbeat, args=(job['id'], job['claim'], stop), daemon=True).start()
+        try:
+            process_job(job['id'], job['payload'], channel)
+            if update_job(job['id'], claim=job['claim'], status='done', stage='done', progress=100):
+                channel.publish('done', {'session_id': job['payload']['session_id']})
+            else:
+                print(f"Job {job['id']} finished after another worker took it over")
+        except Exception as e:
+            print(f"Job {job['id']} failed: {e}")
+            if update_job(job['id'], claim=job['claim'], status='failed', stage='failed', error=str(e)):
+                channel.publish('failed', {'error': str(e)})
+        finally:
+            stop.set()
+            close_job_channel(job['id'])
+
+def start_job_workers():
+    for i in range(JOB_WORKERS):
+        threading.Thread(target=job_worker, name=f'job-worker-{i}', daemon=True).start()
 
 @app.route('/')
 def index():
@@ -232,7 +809,8 @@ def index():
 
 @app.route('/uploads/<filename>')
 def serve_uploaded_file(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    # Byte ranges, validators and caching headers so video seeking never re-downloads the file
+    return serve_media(UPLOAD_FOLDER, filename)
 
 @app.route('/login', methods=['GET', 'POST'])
 async def login():
@@ -313,37 +891,19 @@ async def process_video():
         return jsonify({"message": "Authentication required"}), 401
     
     session_id = str(uuid.uuid4())
+    job_id = str(uuid.uuid4())
     user_id = session['user_id']
-    
-    is_youtube = False
-    youtube_id = None
-    video_path = None
-    title = None
-    cookies_file = None
+    payload = {'session_id': session_id, 'user_id': user_id}
     
     if 'youtube_url' in request.form:
-        youtube_url = request.form.get('youtube_url')
-        if not await check_youtube_video(youtube_url):
-            return jsonify({"message": "Video is not accessible (private, restricted, or unavailable)"}), 400
+        payload['youtube_url'] = request.form.get('youtube_url')
         
         if 'cookies' in request.files:
             cookies = request.files['cookies']
             if cookies.filename != '':
-                cookies_file = os.path.join(UPLOAD_FOLDER, secure_filename(cookies.filename))
+                cookies_file = os.path.join(UPLOAD_FOLDER, f"{job_id}_{secure_filename(cookies.filename)}")
                 await asyncio.get_event_loop().run_in_executor(executor, cookies.save, cookies_file)
-        
-        result = await download_youtube_video(youtube_url, cookies_file)
-        
-        if cookies_file and os.path.exists(cookies_file):
-            await asyncio.get_event_loop().run_in_executor(executor, os.remove, cookies_file)
-        
-        if not result:
-            return jsonify({"message": "Failed to download YouTube video"}), 400
-        
-        is_youtube = True
-        youtube_id = result['video_id']
-        video_path = os.path.normpath(result['filepath']).replace(os.sep, '/')
-        title = result['title']
+                payload['cookies_file'] = cookies_file
         
     elif 'video' in request.files:
         file = request.files['video']
@@ -354,36 +914,323 @@ async def process_video():
             filename = secure_filename(file.filename)
             file_path = os.path.join(UPLOAD_FOLDER, f"{session_id}_{filename}")
             await asyncio.get_event_loop().run_in_executor(executor, file.save, file_path)
-            video_path = os.path.normpath(file_path).replace(os.sep, '/')
-            title = request.form.get('title', filename)
+            payload['video_path'] = os.path.normpath(file_path).replace(os.sep, '/')
+            payload['title'] = request.form.get('title', filename)
         else:
             return jsonify({"message": "Invalid file format"}), 400
     else:
         return jsonify({"message": "No video provided"}), 400
     
-    transcript = await asyncio.get_event_loop().run_in_executor(executor, transcribe_video, video_path)
-    summary = summarize_text(transcript)
+    # Download, transcription and summarization run on the job workers
+    enqueue_job(job_id, user_id, session_id, payload)
+    
+    return jsonify({
+        "message": "Video queued for processing",
+        "job_id": job_id,
+        "session_id": session_id
+    }), 202
+
+def load_upload(conn, upload_id):
+    upload = conn.execute(text('''
+    SELECT *, CAST(strftime('%s', updated_at) AS INTEGER) + :lifetime AS expires_at FROM upload WHERE id = :id
+    '''), {'id': upload_id, 'lifetime': UPLOAD_EXPIRE_SECONDS}).mappings().fetchone()
+    if not upload:
+        return None, (jsonify({"message": "Upload not found"}), 404)
+    if upload['user_id'] != session['user_id']:
+        return None, (jsonify({"message": "Unauthorized"}), 403)
+    if upload['status'] == 'open' and upload['expires_at'] < time.time():
+        return None, (jsonify({"message": "Upload expired"}), 410)
+    return upload, None
+
+def upload_headers(upload, offset=None):
+    headers = {
+        'Upload-Offset': str(upload['offset'] if offset is None else offset),
+        'Upload-Length': str(upload['size']),
+        'Cache-Control': 'no-store',
+    }
+    if upload['status'] == 'open':
+        # A PATCH pushes the expiry out again
+        expires_at = upload['expires_at'] if offset is None else time.time() + UPLOAD_EXPIRE_SECONDS
+        headers['Upload-Expires'] = http_date(expires_at)
+    return headers
+
+def expire_uploads():
+    # Drops open uploads that have gone quiet, with their partial files, and forgets
+    # finalized ones after the same time. An upload with a PATCH in progress is skipped
+    age = f"-{UPLOAD_EXPIRE_SECONDS} seconds"
+    now = time.time()
+    with engine.connect() as conn:
+        expired = conn.execute(text('''
+        SELECT id, path FROM upload
+        WHERE status = 'open' AND updated_at < datetime('now', :age) AND (locked_until IS NULL OR locked_until < :now)
+        '''), {'age': age, 'now': now}).mappings().fetchall()
+        for upload in expired:
+            deleted = conn.execute(text('''
+            DELETE FROM upload
+            WHERE id = :id AND status = 'open' AND updated_at < datetime('now', :age) AND (locked_until IS NULL OR locked_until < :now)
+            '''), {'id': upload['id'], 'age': age, 'now': now}).rowcount
+            conn.commit()
+            if deleted:
+                resumable.discard(upload['id'], upload['path'])
+        conn.execute(text("DELETE FROM upload WHERE status = 'done' AND updated_at < datetime('now', :age)"), {'age': age})
+        conn.commit()
+    return len(expired)
+
+def upload_sweeper():
+    while True:
+        try:
+            expire_uploads()
+        except Exception as e:
+            print(f"Upload sweep failed: {e}")
+        time.sleep(UPLOAD_SWEEP_SECONDS)
+
+@app.route('/upload', methods=['POST'])
+def create_upload():
+    if not is_authenticated():
+        return jsonify({"message": "Authentication required"}), 401
+    
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('filename') or '')
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({"message": "File size is required"}), 400
+    
+    if not filename or not allowed_file(filename):
+        return jsonify({"message": "Invalid file format"}), 400
+    if size <= 0 or size > MAX_UPLOAD_BYTES:
+        return jsonify({"message": f"File size must be between 1 byte and {MAX_UPLOAD_BYTES} bytes"}), 413
+    
+    # The upload is written in place at the path the processed session will use
+    upload_id = str(uuid.uuid4())
+    session_id = str(uuid.uuid4())
+    file_path = os.path.normpath(os.path.join(UPLOAD_FOLDER, f"{session_id}_{filename}")).replace(os.sep, '/')
+    resumable.create_file(file_path)
     
     with engine.connect() as conn:
         conn.execute(text('''
-        INSERT INTO session (id, user_id, title, is_youtube, video_path, youtube_id, transcript, summary)
-        VALUES (:id, :user_id, :title, :is_youtube, :video_path, :youtube_id, :transcript, :summary)
-        '''), {
-            'id': session_id,
-            'user_id': user_id,
-            'title': title,
-            'is_youtube': is_youtube,
-            'video_path': video_path,
-            'youtube_id': youtube_id,
-            'transcript': transcript,
-            'summary': summary
-        })
+        INSERT INTO upload (id, user_id, session_id, filename, title, path, size)
+        VALUES (:id, :user_id, :session_id, :filename, :title, :path, :size)
+        '''), {'id': upload_id, 'user_id': session['user_id'], 'session_id': session_id, 'filename': filename,
+              'title': data.get('title') or filename, 'path': file_path, 'size': size})
+        conn.commit()
+    
+    return jsonify({"upload_id": upload_id, "offset": 0, "size": size}), 201, {
+        'Location': f"/upload/{upload_id}", 'Upload-Offset': '0', 'Upload-Length': str(size),
+        'Upload-Expires': http_date(time.time() + UPLOAD_EXPIRE_SECONDS)
+    }
+
+@app.route('/upload/<upload_id>', methods=['GET', 'HEAD'])
+def get_upload(upload_id):
+    if not is_authenticated():
+        return jsonify({"message": "Authentication required"}), 401
+    
+    with engine.connect() as conn:
+        upload, error = load_upload(conn, upload_id)
+    if error:
+        return error
+    
+    # Clients ask for the offset after a dropped connection and resume from there
+    return jsonify({"upload_id": upload_id, "offset": upload['offset'], "size": upload['size'],
+                    "status": upload['status']}), 200, upload_headers(upload)
+
+@app.route('/upload/<upload_id>', methods=['PATCH'])
+def patch_upload(upload_id):
+    if not is_authenticated():
+        return jsonify({"message": "Authentication required"}), 401
+    
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({"message": "Upload-Offset header is required"}), 400
+    
+    with engine.connect() as conn:
+        upload, error = load_upload(conn, upload_id)
+        if error:
+            return error
+        if upload['status'] != 'open':
+            return jsonify({"message": "Upload is already finalized"}), 409
+        if offset != upload['offset']:
+            return jsonify({"message": "Offset mismatch", "offset": upload['offset']}), 409, upload_headers(upload)
+        
+        # Only one request appends at a time, across threads and worker processes
+        now = time.time()
+        claimed = conn.execute(text('''
+        UPDATE upload SET locked_until = :until
+        WHERE id = :id AND offset = :offset AND status = 'open' AND (locked_until IS NULL OR locked_until < :now)
+        '''), {'until': now + UPLOAD_LOCK_SECONDS, 'id': upload_id, 'offset': offset, 'now': now}).rowcount
+        conn.commit()
+        if not claimed:
+            # Another request is still appending; the client waits for its lock to clear
+            retry_after = max(1, int((upload['locked_until'] or now) - now))
+            return jsonify({"message": "Upload is busy", "offset": upload['offset'], "retry_after": retry_after}), 409, {
+                **upload_headers(upload), 'Retry-After': str(retry_after)
+            }
+    
+    new_offset = offset
+    try:
+        new_offset = resumable.write_chunk(upload_id, upload['path'], offset, request.stream, upload['size'] - offset)
+    finally:
+        with engine.connect() as conn:
+            conn.execute(text('''
+            UPDATE upload SET offset = :offset, locked_until = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = :id
+            '''), {'offset': new_offset, 'id': upload_id})
+            conn.commit()
+    
+    return jsonify({"offset": new_offset, "size": upload['size']}), 200, upload_headers(upload, new_offset)
+
+@app.route('/upload/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    if not is_authenticated():
+        return jsonify({"message": "Authentication required"}), 401
+    
+    with engine.connect() as conn:
+        upload, error = load_upload(conn, upload_id)
+        if error:
+            return error
+        if upload['status'] != 'open':
+            return jsonify({"message": "Upload is already finalized"}), 409
+        if upload['offset'] != upload['size']:
+            return jsonify({"message": "Upload is incomplete", "offset": upload['offset']}), 409, upload_headers(upload)
+        # Held like a PATCH so a second finalize or a late chunk can't run alongside;
+        # the upload only becomes 'done' once its job exists
+        now = time.time()
+        claimed = conn.execute(text('''
+        UPDATE upload SET locked_until = :until
+        WHERE id = :id AND status = 'open' AND (locked_until IS NULL OR locked_until < :now)
+        '''), {'until': now + UPLOAD_LOCK_SECONDS, 'id': upload_id, 'now': now}).rowcount
         conn.commit()
+        if not claimed:
+            return jsonify({"message": "Upload is busy"}), 409
+    
+    # The file is already in place; its hash was taken as chunks arrived (or is rebuilt
+    # from disk here after a restart)
+    try:
+        media_hash = resumable.finish(upload_id, upload['path'], upload['size'])
+    except Exception as e:
+        print(f"Could not hash upload {upload_id}: {e}")
+        with engine.connect() as conn:
+            conn.execute(text("UPDATE upload SET locked_until = NULL WHERE id = :id"), {'id': upload_id})
+            conn.commit()
+        return jsonify({"message": "Could not read the uploaded file"}), 500
+    
+    job_id = str(uuid.uuid4())
+    payload = {
+        'session_id': upload['session_id'],
+        'user_id': upload['user_id'],
+        'video_path': upload['path'],
+        'title': upload['title'],
+        'media_hash': media_hash,
+    }
+    with engine.connect() as conn:
+        insert_job(conn, job_id, upload['user_id'], upload['session_id'], payload)
+        conn.execute(text('''
+        UPDATE upload SET status = 'done', locked_until = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = :id
+        '''), {'id': upload_id})
+        conn.commit()
+    job_event.set()
+    resumable.discard(upload_id)
     
     return jsonify({
-        "message": "Video processed successfully",
-        "session_id": session_id
-    })
+        "message": "Video queued for processing",
+        "job_id": job_id,
+        "session_id": upload['session_id']
+    }), 202
+
+@app.route('/upload/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    if not is_authenticated():
+        return jsonify({"message": "Authentication required"}), 401
+    
+    with engine.connect() as conn:
+        upload, error = load_upload(conn, upload_id)
+        if error:
+            return error
+        if upload['status'] != 'open':
+            return jsonify({"message": "Upload is already finalized"}), 409
+        # Not while a chunk is being written or the upload is being finalized
+        now = time.time()
+        deleted = conn.execute(text('''
+        DELETE FROM upload WHERE id = :id AND status = 'open' AND (locked_until IS NULL OR locked_until < :now)
+        '''), {'id': upload_id, 'now': now}).rowcount
+        conn.commit()
+        if not deleted:
+            return jsonify({"message": "Upload is busy"}), 409
+    resumable.discard(upload_id, upload['path'])
+    
+    return jsonify({"message": "Upload cancelled"})
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    if not is_authenticated():
+        return jsonify({"message": "Authentication required"}), 401
+    
+    with engine.connect() as conn:
+        job = conn.execute(text('''
+        SELECT id, user_id, session_id, status, stage, progress, error, created_at, updated_at
+        FROM job WHERE id = :id
+        '''), {'id': job_id}).mappings().fetchone()
+        
+        if not job:
+            return jsonify({"message": "Job not found"}), 404
+        
+        if job['user_id'] != session['user_id'] and not is_admin():
+            return jsonify({"message": "Unauthorized"}), 403
+        
+        return jsonify({"job": dict(job)})
+
+def job_event_stream(job_id, index):
+    last = None
+    while True:
+        channel = job_channels.get(job_id)
+        events = channel.wait(index, SSE_POLL_SECONDS) if channel else []
+        for name, data in events:
+            index += 1
+            yield sse_event(name, data, index)
+            if name in ('done', 'failed'):
+                return
+        if events:
+            continue
+        
+        # Nothing published here: the job is queued or running in another process,
+        # so report what the job row says
+        with engine.connect() as conn:
+            job = conn.execute(text("SELECT status, stage, progress, session_id, error FROM job WHERE id = :id"),
+                               {'id': job_id}).mappings().fetchone()
+        if not job:
+            return
+        if job['status'] == 'done':
+            yield sse_event('done', {'session_id': job['session_id']})
+            return
+        if job['status'] == 'failed':
+            yield sse_event('failed', {'error': job['error']})
+            return
+        if (job['stage'], job['progress']) != last:
+            last = (job['stage'], job['progress'])
+            yield sse_event('stage', {'stage': job['stage'], 'progress': job['progress']})
+        else:
+            yield ": keepalive\n\n"
+
+@app.route('/jobs/<job_id>/events')
+def stream_job_events(job_id):
+    if not is_authenticated():
+        return jsonify({"message": "Authentication required"}), 401
+    
+    with engine.connect() as conn:
+        job = conn.execute(text("SELECT user_id FROM job WHERE id = :id"), {'id': job_id}).mappings().fetchone()
+        
+        if not job:
+            return jsonify({"message": "Job not found"}), 404
+        
+        if job['user_id'] != session['user_id'] and not is_admin():
+            return jsonify({"message": "Unauthorized"}), 403
+    
+    # EventSource sends the last id it saw when it reconnects; resume after it
+    last_event_id = request.headers.get('Last-Event-ID', '0')
+    index = int(last_event_id) if last_event_id.isdigit() else 0
+    
+    return Response(stream_with_context(job_event_stream(job_id, index)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/results/<session_id>')
 def get_results(session_id):
@@ -391,7 +1238,10 @@ def get_results(session_id):
         return jsonify({"message": "Authentication required"}), 401
     
     with engine.connect() as conn:
-        session_data = conn.execute(text("SELECT * FROM session WHERE id = :id"), {'id': session_id}).mappings().fetchone()
+        session_data = conn.execute(text("""
+        SELECT id, user_id, title, timestamp, is_youtube, video_path, youtube_id, transcription_backend, conversation_count
+        FROM session WHERE id = :id
+        """), {'id': session_id}).mappings().fetchone()
         
         if not session_data:
             return jsonify({"message": "Session not found"}), 404
@@ -399,14 +1249,25 @@ def get_results(session_id):
         if session_data['user_id'] != session['user_id'] and not is_admin():
             return jsonify({"message": "Unauthorized"}), 403
         
+        # Large text is only loaded when asked for, e.g. ?include=summary,transcript,segments
+        include = request.args.get('include', SUMMARY).split(',')
+        texts = blob_store.get_texts(conn, session_id, [SUMMARY] if SUMMARY in include else [])
+        if TRANSCRIPT in include or SEGMENTS in include:
+            segments = load_segments(conn, session_id)
+            if TRANSCRIPT in include:
+                texts[TRANSCRIPT] = segments.render()
+            if SEGMENTS in include:
+                texts[SEGMENTS] = segments.rows()
+        
         conversations = conn.execute(text("SELECT * FROM conversation WHERE session_id = :id ORDER BY timestamp DESC"),
                                    {'id': session_id}).mappings().fetchall()
         
-        session_dict = dict(session_data)
+        session_dict = {**dict(session_data), **texts}
         conversation_list = [dict(conv) for conv in conversations]
         
         video_url = None
-        if session_dict['is_youtube'] and session_dict['youtube_id']:
+        # YouTube sessions play through the embed unless a local copy was downloaded
+        if session_dict['is_youtube'] and session_dict['youtube_id'] and not session_dict['video_path']:
             video_url = f"https://www.youtube.com/embed/{session_dict['youtube_id']}"
         elif session_dict['video_path']:
             video_url = f"{request.host_url}uploads/{session_dict['video_path'].split('/')[-1]}"
@@ -417,6 +1278,36 @@ def get_results(session_id):
             "video_url": video_url
         })
 
+@app.route('/results/<session_id>/segments')
+def get_segments(session_id):
+    if not is_authenticated():
+        return jsonify({"message": "Authentication required"}), 401
+    
+    with engine.connect() as conn:
+        session_data = conn.execute(text("SELECT user_id FROM session WHERE id = :id"), {'id': session_id}).mappings().fetchone()
+        
+        if not session_data:
+            return jsonify({"message": "Session not found"}), 404
+        
+        if session_data['user_id'] != session['user_id'] and not is_admin():
+            return jsonify({"message": "Unauthorized"}), 403
+        
+        segments = load_segments(conn, session_id)
+    
+    # ?at=ms returns the segment playing at that time; ?start_ms=&end_ms= the ones overlapping a range
+    try:
+        if request.args.get('at') is not None:
+            index = segments.at(int(request.args['at']))
+            indexes = [] if index is None else [index]
+        else:
+            indexes = segments.between(int(request.args.get('start_ms', 0)), int(request.args.get('end_ms', 2 ** 62)))
+    except ValueError:
+        return jsonify({"message": "Times must be integers in milliseconds"}), 400
+    
+    return jsonify({
+        "segments": segments.rows(indexes)
+    })
+
 @app.route('/ask', methods=['POST'])
 async def ask_question():
     if not is_authenticated():
@@ -430,7 +1321,7 @@ async def ask_question():
         return jsonify({"message": "Session ID and question are required"}), 400
     
     with engine.connect() as conn:
-        session_data = conn.execute(text("SELECT transcript, user_id FROM session WHERE id = :id"),
+        session_data = conn.execute(text("SELECT user_id FROM session WHERE id = :id"),
                                   {'id': session_id}).mappings().fetchone()
         
         if not session_data:
@@ -439,30 +1330,45 @@ async def ask_question():
         if session_data['user_id'] != session['user_id'] and not is_admin():
             return jsonify({"message": "Unauthorized"}), 403
         
-        transcript = session_data['transcript']
-        
-        answer = await asyncio.get_event_loop().run_in_executor(executor, answer_question, transcript, question)
-        
-        conn.execute(text('''
-        INSERT INTO conversation (session_id, question, answer)
-        VALUES (:session_id, :question, :answer)
-        '''), {'session_id': session_id, 'question': question, 'answer': answer})
-        conn.commit()
-        
-        conversation_id = conn.execute(text("SELECT last_insert_rowid()")).fetchone()[0]
-        
+        answer = answer_cache.get(session_id, question)
+        if answer is None:
+            excerpts = question_context(conn, session_id, question)
+    
+    if answer is not None:
+        conversation_id = save_conversation(session_id, question, answer)
         return jsonify({
             "answer": answer,
-            "conversation_id": conversation_id
+            "conversation_id": conversation_id,
+            "cached": True
         })
+    
+    try:
+        answer = await asyncio.get_event_loop().run_in_executor(executor, answer_question, excerpts, question)
+    except LLMBusyError:
+        return jsonify({"message": "The assistant is busy, please try again shortly"}), 503
+    if answer != ANSWER_ERROR:
+        answer_cache.put(session_id, question, answer)
+    conversation_id = save_conversation(session_id, question, answer)
+    
+    return jsonify({
+        "answer": answer,
+        "conversation_id": conversation_id
+    })
 
-@app.route('/download_transcript/<session_id>')
-async def download_transcript(session_id):
+@app.route('/ask/stream', methods=['POST'])
+def ask_question_stream():
     if not is_authenticated():
         return jsonify({"message": "Authentication required"}), 401
     
+    data = request.get_json()
+    session_id = data.get('session_id')
+    question = data.get('question')
+    
+    if not session_id or not question:
+        return jsonify({"message": "Session ID and question are required"}), 400
+    
     with engine.connect() as conn:
-        session_data = conn.execute(text("SELECT transcript, title, user_id FROM session WHERE id = :id"),
+        session_data = conn.execute(text("SELECT user_id FROM session WHERE id = :id"),
                                   {'id': session_id}).mappings().fetchone()
         
         if not session_data:
@@ -471,29 +1377,147 @@ async def download_transcript(session_id):
         if session_data['user_id'] != session['user_id'] and not is_admin():
             return jsonify({"message": "Unauthorized"}), 403
         
-        transcript = session_data['transcript']
-        title = session_data['title']
+        cached_answer = answer_cache.get(session_id, question)
+        excerpts = question_context(conn, session_id, question) if cached_answer is None else None
+    
+    def stream():
+        if cached_answer is not None:
+            yield sse_event('answer', {'text': cached_answer})
+            yield sse_event('done', {'conversation_id': save_conversation(session_id, question, cached_answer), 'cached': True})
+            return
+        # Relay Gemini chunks as they arrive; the answer is stored once it is complete
+        parts = []
+        try:
+            for delta in stream_answer(excerpts, question):
+                parts.append(delta)
+                yield sse_event('answer', {'text': delta})
+        except LLMBusyError:
+            yield sse_event('failed', {'error': "The assistant is busy, please try again shortly"})
+            return
+        except Exception as e:
+            print(f"Question answering error: {e}")
+            yield sse_event('failed', {'error': ANSWER_ERROR})
+            return
+        # Reached only when the stream ran to the end (a disconnected client stops the
+        # generator at a yield); an empty reply is reported as a failure, never cached
+        answer = "".join(parts)
+        if not answer.strip():
+            yield sse_event('failed', {'error': ANSWER_ERROR})
+            return
+        answer_cache.put(session_id, question, answer)
+        conversation_id = save_conversation(session_id, question, answer)
+        yield sse_event('done', {'conversation_id': conversation_id})
+    
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/summarize/<session_id>', methods=['POST'])
+async def resummarize(session_id):
+    if not is_authenticated():
+        return jsonify({"message": "Authentication required"}), 401
+    
+    data = request.get_json() or {}
+    style = data.get('style', DEFAULT_STYLE)
+    
+    if style not in STYLES:
+        return jsonify({"message": f"Style must be one of: {', '.join(STYLES)}"}), 400
+    
+    with engine.connect() as conn:
+        session_data = conn.execute(text("SELECT user_id FROM session WHERE id = :id"),
+                                  {'id': session_id}).mappings().fetchone()
         
-        safe_title = re.sub(r'[^a-zA-Z0-9]', '_', title)
-        temp_file = f"temp_{safe_title}_transcript.txt"
+        if not session_data:
+            return jsonify({"message": "Session not found"}), 404
         
-        async with aiofiles.open(temp_file, 'w', encoding='utf-8') as f:
-            await f.write(f"Transcript for: {title}\n\n")
-            await f.write(transcript)
+        if session_data['user_id'] != session['user_id'] and not is_admin():
+            return jsonify({"message": "Unauthorized"}), 403
         
-        response = send_file(
-            temp_file,
-            as_attachment=True,
-            download_name=f"{safe_title}_transcript.txt",
-            mimetype='text/plain'
-        )
+        transcript = load_segments(conn, session_id).render()
+    
+    summary = await asyncio.get_event_loop().run_in_executor(executor, summarize_text, transcript, None, style)
+    
+    if summary == SUMMARY_ERROR:
+        return jsonify({"message": "Failed to generate summary"}), 500
+    
+    with engine.connect() as conn:
+        blob_store.put_text(conn, session_id, SUMMARY, summary)
+        conn.commit()
+    
+    return jsonify({"summary": summary, "style": style})
+
+# Download formats: content type and how the segments are rendered
+TRANSCRIPT_FORMATS = {
+    'txt': 'text/plain',
+    'srt': 'application/x-subrip',
+    'vtt': 'text/vtt',
+    'json': 'application/json',
+}
+DOWNLOAD_CHUNK_CHARS = 64 * 1024
+
+def transcript_chunks(segments, title, session_id, transcript_format):
+    if transcript_format == 'srt':
+        parts = segments.iter_srt()
+    elif transcript_format == 'vtt':
+        parts = segments.iter_vtt()
+    elif transcript_format == 'json':
+        parts = segments.iter_json(session_id=session_id, title=title)
+    else:
+        parts = [f"Transcript for: {title}\n\n", "\n".join(segments.iter_lines()) or "No transcription available."]
+    # Coalesce small pieces so each write to the client carries a reasonable amount
+    buffer, size = [], 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= DOWNLOAD_CHUNK_CHARS:
+            yield "".join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode('utf-8')
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.route('/download_transcript/<session_id>')
+def download_transcript(session_id):
+    if not is_authenticated():
+        return jsonify({"message": "Authentication required"}), 401
+    
+    transcript_format = request.args.get('format', 'txt').lower()
+    if transcript_format not in TRANSCRIPT_FORMATS:
+        return jsonify({"message": f"Format must be one of: {', '.join(TRANSCRIPT_FORMATS)}"}), 400
+    
+    with engine.connect() as conn:
+        session_data = conn.execute(text("SELECT title, user_id FROM session WHERE id = :id"),
+                                  {'id': session_id}).mappings().fetchone()
+        
+        if not session_data:
+            return jsonify({"message": "Session not found"}), 404
         
-        @response.call_on_close
-        async def cleanup():
-            if os.path.exists(temp_file):
-                await asyncio.get_event_loop().run_in_executor(executor, os.remove, temp_file)
+        if session_data['user_id'] != session['user_id'] and not is_admin():
+            return jsonify({"message": "Unauthorized"}), 403
         
-        return response
+        segments = load_segments(conn, session_id)
+    
+    title = session_data['title']
+    safe_title = re.sub(r'[^a-zA-Z0-9]', '_', title)
+    
+    # Rendered and streamed straight to the client; nothing touches the filesystem
+    body = transcript_chunks(segments, title, session_id, transcript_format)
+    headers = {
+        'Content-Disposition': f'attachment; filename="{safe_title}_transcript.{transcript_format}"',
+        'Cache-Control': 'private, no-cache',
+        'Vary': 'Accept-Encoding',
+    }
+    if 'gzip' in request.accept_encodings:
+        body = gzip_chunks(body)
+        headers['Content-Encoding'] = 'gzip'
+    
+    return Response(body, mimetype=TRANSCRIPT_FORMATS[transcript_format], headers=headers)
 
 @app.route('/history')
 def get_history():
@@ -501,23 +1525,51 @@ def get_history():
         return jsonify({"message": "Authentication required"}), 401
     
     user_id = session['user_id']
+    limit = page_size(request.args.get('limit'))
+    # Newest first; ?cursor= continues after the last session of the previous page
+    params = {'user_id': user_id, 'limit': limit + 1}
+    after = ""
+    if request.args.get('cursor'):
+        try:
+            params['ts'], params['after_id'] = decode_cursor(request.args['cursor'])
+        except ValueError:
+            return jsonify({"message": "Invalid cursor"}), 400
+        after = "AND (timestamp, id) < (:ts, :after_id)"
     
     with engine.connect() as conn:
-        sessions = conn.execute(text("""
-        SELECT s.id, s.title, s.timestamp, s.is_youtube, s.youtube_id, s.video_path, 
-               COUNT(c.id) as conversation_count
-        FROM session s
-        LEFT JOIN conversation c ON s.id = c.session_id
-        WHERE s.user_id = :user_id
-        GROUP BY s.id
-        ORDER BY s.timestamp DESC
-        """), {'user_id': user_id}).mappings().fetchall()
-        
-        sessions_list = [dict(session) for session in sessions]
-        
-        return jsonify({
-            "sessions": sessions_list
-        })
+        sessions = conn.execute(text(f"""
+        SELECT id, title, timestamp, is_youtube, youtube_id, video_path, conversation_count
+        FROM session
+        WHERE user_id = :user_id {after}
+        ORDER BY timestamp DESC, id DESC
+        LIMIT :limit
+        """), params).mappings().fetchall()
+        changed = conn.execute(text("SELECT updated_at FROM change_marker WHERE scope = :scope"),
+                               {'scope': f"history:{user_id}"}).scalar()
+    
+    sessions_list, next_cursor = split_page(sessions, limit)
+    return page_response({
+        "sessions": sessions_list,
+        "next_cursor": next_cursor
+    }, parse_timestamp(changed))
+
+@app.route('/search')
+def search_transcripts():
+    if not is_authenticated():
+        return jsonify({"message": "Authentication required"}), 401
+    
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"message": "Search query is required"}), 400
+    
+    # Matching transcript segments across all of the user's sessions, best first
+    with engine.connect() as conn:
+        results = search_index.search(conn, session['user_id'], query,
+                                      page_size(request.args.get('limit'), search_index.SEARCH_LIMIT))
+    
+    return jsonify({
+        "results": results
+    })
 
 @app.route('/delete_session/<session_id>', methods=['POST'])
 async def delete_session(session_id):
@@ -535,14 +1587,21 @@ async def delete_session(session_id):
         if session_data['user_id'] != user_id and not is_admin():
             return jsonify({"message": "Unauthorized"}), 403
         
-        video_data = conn.execute(text("SELECT is_youtube, video_path FROM session WHERE id = :id"),
+        video_data = conn.execute(text("SELECT is_youtube, video_path, media_hash FROM session WHERE id = :id"),
                                 {'id': session_id}).mappings().fetchone()
         
         conn.execute(text("DELETE FROM conversation WHERE session_id = :id"), {'id': session_id})
+        blob_store.delete_texts(conn, session_id)
+        search_index.remove_session(conn, session_id)
         conn.execute(text("DELETE FROM session WHERE id = :id"), {'id': session_id})
+        if video_data['media_hash']:
+            # Shared media is unlinked only when its last session goes
+            media_store.release(conn, video_data['media_hash'])
         conn.commit()
+        cache.pop(f"index_{session_id}", None)
+        answer_cache.invalidate(session_id)
         
-        if not video_data['is_youtube'] and video_data['video_path']:
+        if not video_data['is_youtube'] and video_data['video_path'] and not video_data['media_hash']:
             if os.path.exists(video_data['video_path']):
                 await asyncio.get_event_loop().run_in_executor(executor, os.remove, video_data['video_path'])
         
@@ -602,13 +1661,26 @@ async def contact():
         if not is_authenticated() or not is_admin():
             return jsonify({"message": "Unauthorized"}), 403
         
+        limit = page_size(request.args.get('limit'))
+        params = {'limit': limit + 1}
+        after = ""
+        if request.args.get('cursor'):
+            try:
+                params['ts'], params['after_id'] = decode_cursor(request.args['cursor'])
+            except ValueError:
+                return jsonify({"message": "Invalid cursor"}), 400
+            after = "WHERE (timestamp, id) < (:ts, :after_id)"
+        
         with engine.connect() as conn:
-            messages = conn.execute(text("SELECT * FROM contact_message ORDER BY timestamp DESC")).mappings().fetchall()
-            messages_list = [dict(message) for message in messages]
+            messages = conn.execute(text(f"SELECT * FROM contact_message {after} ORDER BY timestamp DESC, id DESC LIMIT :limit"),
+                                    params).mappings().fetchall()
+            changed = conn.execute(text("SELECT updated_at FROM change_marker WHERE scope = 'contact'")).scalar()
         
-            return jsonify({
-                "messages": messages_list
-            })
+        messages_list, next_cursor = split_page(messages, limit)
+        return page_response({
+            "messages": messages_list,
+            "next_cursor": next_cursor
+        }, parse_timestamp(changed))
 
 @app.route('/about')
 def about():
@@ -704,14 +1776,73 @@ def admin_stats():
         total_users = conn.execute(text("SELECT COUNT(*) FROM user")).fetchone()[0]
         total_sessions = conn.execute(text("SELECT COUNT(*) FROM session")).fetchone()[0]
         total_questions = conn.execute(text("SELECT COUNT(*) FROM conversation")).fetchone()[0]
+        media = media_store.stats(conn)
         
         return jsonify({
             "total_users": total_users,
             "total_sessions": total_sessions,
             "total_videos": total_sessions,
-            "total_questions": total_questions
+            "total_questions": total_questions,
+            "media_objects": media['objects'],
+            "media_stored_bytes": media['stored_bytes'],
+            "media_referenced_bytes": media['referenced_bytes']
         })
 
-if __name__ == '__main__':
+@app.route('/admin/llm_stats')
+def admin_llm_stats():
+    if not is_authenticated() or not is_admin():
+        return jsonify({"message": "Unauthorized"}), 403
+    
+    return jsonify({**llm.stats(), 'answer_cache': answer_cache.stats(), 'single_flight': flights.stats()})
+
+startup_lock = threading.Lock()
+started = False
+
+def startup():
+    # Everything with side effects runs here rather than at import: transcription workers
+    # are spawned processes that re-import this script (as __mp_main__) and must not
+    # open the database, preload models or start job workers of their own.
+    # Runs once per process, whichever entry point gets here first
+    global started
+    with startup_lock:
+        if started:
+            return
+        start_services()
+        started = True
+
+def start_services():
+    global TRANSCRIPTION_BACKEND, TRANSCRIBE_PROCESSES
+    TRANSCRIPTION_BACKEND = select_backend(
+        WHISPER_MODEL_SIZE,
+        device=os.environ.get('WHISPER_DEVICE', 'auto'),
+        compute_type=os.environ.get('WHISPER_COMPUTE_TYPE', 'auto'),
+        cpu_threads=int(os.environ.get('WHISPER_CPU_THREADS', 0)),
+        num_workers=int(os.environ.get('WHISPER_NUM_WORKERS', 0)),
+        benchmark=os.environ.get('WHISPER_BENCHMARK', '0') == '1'
+    )
+    TRANSCRIBE_PROCESSES = int(os.environ.get('TRANSCRIBE_PROCESSES', 0)) or default_processes(TRANSCRIPTION_BACKEND)
     
+    init_db()
+    warm_answer_cache()
+    executor.submit(backfill_search_index)
+    
+    # Load the whisper model(s) in the background so the first request doesn't pay for it
+    if WHISPER_PRELOAD:
+        executor.submit(preload_transcriber, WHISPER_MODEL_SIZE, TRANSCRIPTION_BACKEND, TRANSCRIBE_PROCESSES)
+    
+    start_job_workers()
+    threading.Thread(target=upload_sweeper, name='upload-sweeper', daemon=True).start()
+
+# WSGI servers and `flask run` import the app without running the block below; the first
+# request starts it there
+@app.before_request
+def ensure_started():
+    startup()
+
+if __name__ == '__main__':
+    # With debug on, this script runs twice: a reloader parent that only watches files, and
+    # the child that serves. Only the child starts workers, or the parent would claim jobs
+    # and publish their events where no SSE client can see them
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        startup()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,95 @@
+import gzip
+
+from sqlalchemy import text
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Large per-session text (transcript, summary) lives in session_blob, compressed, so the
+# session row that /history, /ask and delete_session touch stays small
+TRANSCRIPT = 'transcript'
+SUMMARY = 'summary'
+# Packed segment table (see segments.py); the formatted transcript is rendered from it
+SEGMENTS = 'segments'
+# BM25 index of transcript chunks (see retrieval.py), JSON
+INDEX = 'index'
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+MIGRATE_BATCH = 100
+
+
+def compress(value):
+    data = value.encode('utf-8')
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return 'gzip', gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def decompress(codec, data):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this blob")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    if codec == 'gzip':
+        return gzip.decompress(data).decode('utf-8')
+    return data.decode('utf-8')
+
+
+def create_table(conn):
+    conn.execute(text('''
+    CREATE TABLE IF NOT EXISTS session_blob (
+        session_id VARCHAR(100) NOT NULL,
+        kind VARCHAR(20) NOT NULL,
+        codec VARCHAR(10) NOT NULL,
+        size INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (session_id, kind)
+    )
+    '''))
+
+
+def put_text(conn, session_id, kind, value):
+    if value is None:
+        return
+    codec, data = compress(value)
+    conn.execute(text('''
+    INSERT OR REPLACE INTO session_blob (session_id, kind, codec, size, data)
+    VALUES (:session_id, :kind, :codec, :size, :data)
+    '''), {'session_id': session_id, 'kind': kind, 'codec': codec, 'size': len(value), 'data': data})
+
+
+def get_text(conn, session_id, kind):
+    row = conn.execute(text("SELECT codec, data FROM session_blob WHERE session_id = :id AND kind = :kind"),
+                       {'id': session_id, 'kind': kind}).mappings().fetchone()
+    return decompress(row['codec'], row['data']) if row else None
+
+
+def get_texts(conn, session_id, kinds):
+    # Only the requested kinds are read and decompressed
+    return {kind: get_text(conn, session_id, kind) for kind in kinds}
+
+
+def delete_texts(conn, session_id):
+    conn.execute(text("DELETE FROM session_blob WHERE session_id = :id"), {'id': session_id})
+
+
+def move_session_texts(conn):
+    # Sessions stored before the blob table existed keep their text inline; move it out
+    # in batches so startup never holds one huge transaction
+    moved = 0
+    while True:
+        rows = conn.execute(text('''
+        SELECT id, transcript, summary FROM session
+        WHERE transcript IS NOT NULL OR summary IS NOT NULL
+        LIMIT :limit
+        '''), {'limit': MIGRATE_BATCH}).mappings().fetchall()
+        if not rows:
+            return moved
+        for row in rows:
+            put_text(conn, row['id'], TRANSCRIPT, row['transcript'])
+            put_text(conn, row['id'], SUMMARY, row['summary'])
+            conn.execute(text("UPDATE session SET transcript = NULL, summary = NULL WHERE id = :id"), {'id': row['id']})
+        conn.commit()
+        moved += len(rows)
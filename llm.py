@@ -0,0 +1,171 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+# Provider errors worth retrying: rate limits and transient server failures
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMBusyError(Exception):
+    pass
+
+
+class GeminiBackend:
+    def __init__(self, model_name='gemini-1.5-flash', api_key=None):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key or os.environ.get('GOOGLE_API_KEY'))
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt, max_output_tokens, timeout):
+        response = self.model.generate_content(prompt, generation_config={"max_output_tokens": max_output_tokens},
+                                               request_options={"timeout": timeout})
+        return response.text
+
+    def stream(self, prompt, max_output_tokens, timeout):
+        for chunk in self.model.generate_content(prompt, generation_config={"max_output_tokens": max_output_tokens},
+                                                 request_options={"timeout": timeout}, stream=True):
+            yield chunk.text
+
+
+class StubBackend:
+    # Offline stand-in: deterministic text derived from the prompt, no network
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def generate(self, prompt, max_output_tokens, timeout):
+        return "".join(self.stream(prompt, max_output_tokens, timeout))
+
+    def stream(self, prompt, max_output_tokens, timeout):
+        words = prompt.split()
+        reply = f"[stub] {len(words)} words: " + " ".join(words[-min(len(words), max_output_tokens // 4, 40):])
+        for word in reply.split(' '):
+            if self.delay:
+                time.sleep(self.delay)
+            yield word + ' '
+
+
+def _status_code(error):
+    # google.api_core exceptions carry the HTTP status as an int in .code
+    code = getattr(error, 'code', None)
+    if callable(code):
+        code = None
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error):
+    return isinstance(error, TimeoutError) or _status_code(error) in RETRYABLE_STATUS
+
+
+class LLMClient:
+    def __init__(self, backend, max_concurrency=4, queue_timeout=10.0, timeout=60.0,
+                 max_retries=3, base_delay=1.0, max_delay=20.0):
+        self.backend = backend
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics_lock = threading.Lock()
+        self.latencies = deque(maxlen=1000)
+        self.counts = {'calls': 0, 'errors': 0, 'retries': 0, 'rejected': 0}
+
+    def _acquire(self, block=False):
+        # Interactive callers wait a bounded time for a slot instead of piling up
+        # behind the provider; background work (block=True) simply queues
+        if not self.slots.acquire(timeout=None if block else self.queue_timeout):
+            self._count('rejected')
+            raise LLMBusyError("Too many concurrent LLM requests")
+
+    def _count(self, name):
+        with self.metrics_lock:
+            self.counts[name] += 1
+
+    def _backoff(self, attempt):
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def _record(self, started, error=None):
+        with self.metrics_lock:
+            self.counts['calls'] += 1
+            if error is not None:
+                self.counts['errors'] += 1
+            self.latencies.append(time.perf_counter() - started)
+
+    def generate(self, prompt, max_output_tokens=500, on_text=None, block=False):
+        if on_text:
+            parts = []
+            for delta in self.stream(prompt, max_output_tokens, block):
+                parts.append(delta)
+                on_text(delta)
+            return "".join(parts)
+
+        self._acquire(block)
+        try:
+            for attempt in range(self.max_retries + 1):
+                started = time.perf_counter()
+                try:
+                    result = self.backend.generate(prompt, max_output_tokens, self.timeout)
+                    self._record(started)
+                    return result
+                except Exception as e:
+                    self._record(started, e)
+                    if attempt == self.max_retries or not is_retryable(e):
+                        raise
+                    self._count('retries')
+                    self._backoff(attempt)
+        finally:
+            self.slots.release()
+
+    def stream(self, prompt, max_output_tokens=500, block=False):
+        # Retries are only possible until the first chunk has been handed out
+        self._acquire(block)
+        try:
+            for attempt in range(self.max_retries + 1):
+                started = time.perf_counter()
+                emitted = False
+                try:
+                    for delta in self.backend.stream(prompt, max_output_tokens, self.timeout):
+                        emitted = True
+                        yield delta
+                    self._record(started)
+                    return
+                except Exception as e:
+                    self._record(started, e)
+                    if emitted or attempt == self.max_retries or not is_retryable(e):
+                        raise
+                    self._count('retries')
+                    self._backoff(attempt)
+        finally:
+            self.slots.release()
+
+    def stats(self):
+        with self.metrics_lock:
+            latencies = sorted(self.latencies)
+            counts = dict(self.counts)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        return {**counts, 'latency_p50': percentile(0.5), 'latency_p95': percentile(0.95), 'latency_p99': percentile(0.99)}
+
+
+def create_client(backend=None, model_name='gemini-1.5-flash'):
+    backend = backend or os.environ.get('LLM_BACKEND', 'gemini')
+    if backend == 'stub':
+        llm_backend = StubBackend(float(os.environ.get('LLM_STUB_DELAY', 0)))
+    elif backend == 'gemini':
+        llm_backend = GeminiBackend(model_name)
+    else:
+        raise ValueError(f"Unknown LLM backend: {backend}")
+    return LLMClient(
+        llm_backend,
+        max_concurrency=int(os.environ.get('LLM_MAX_CONCURRENCY', 4)),
+        queue_timeout=float(os.environ.get('LLM_QUEUE_TIMEOUT', 10)),
+        timeout=float(os.environ.get('LLM_TIMEOUT', 60)),
+        max_retries=int(os.environ.get('LLM_MAX_RETRIES', 3)),
+    )
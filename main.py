@@ -1,5 +1,6 @@
-from flask import Flask, request, jsonify, session, send_file, send_from_directory
+from flask import Flask, request, jsonify, session, send_file
 from flask_cors import CORS
+from media_serving import serve_media
 import sqlite3
 import os
 import uuid
@@ -8,18 +9,17 @@ import hashlib
 import json
 from werkzeug.utils import secure_filename
 import yt_dlp
-import google.generativeai as genai
-from moviepy.editor import VideoFileClip
-import whisper
+from transcription import use_model, preload_model, transcribe_stream, OPENAI_WHISPER
+from llm import create_client
+from migrations import configure_connection, migrate
+import blob_store
+from segments import SegmentTable
 import re
-import tempfile
+import threading
 from datetime import timedelta
 
-# Configure Gemini API key
-genai.configure(api_key=os.environ.get('GOOGLE_API_KEY'))
-
-# Initialize Gemini 1.5 Flash model
-model = genai.GenerativeModel("gemini-1.5-flash")
+# Shared LLM client (Gemini 1.5 Flash by default); bounds concurrency and retries transient errors
+llm = create_client()
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -31,12 +31,23 @@ DATABASE = 'video_analysis.db'
 UPLOAD_FOLDER = 'Uploads'
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
 
+# Whisper model settings; the model is loaded once and shared across requests
+WHISPER_MODEL_SIZE = os.environ.get('WHISPER_MODEL_SIZE', 'base')
+WHISPER_DEVICE = os.environ.get('WHISPER_DEVICE')  # None lets whisper pick cuda/cpu
+WHISPER_PRELOAD = os.environ.get('WHISPER_PRELOAD', '1') == '1'
+
+# How non-English transcripts are translated to English: 'gemini' (transcript text,
+# single recognition pass) or 'whisper' (second pass over the audio)
+TRANSLATOR = os.environ.get('TRANSLATOR', 'gemini')
+TRANSLATION_BATCH_CHARS = 8000
+
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
 # Create database and tables if they don't exist
 def init_db():
     conn = sqlite3.connect(DATABASE)
+    configure_connection(conn)
     cursor = conn.cursor()
     
     # Users table
@@ -99,18 +110,49 @@ def init_db():
         cursor.execute("INSERT INTO user (username, email, password, is_admin) VALUES (?, ?, ?, ?)",
                       ('Admin', 'admin@example.com', hashed_password, 1))
     
+    # Compressed transcripts and summaries, shared with app.py (see blob_store.py)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS session_blob (
+        session_id VARCHAR(100) NOT NULL,
+        kind VARCHAR(20) NOT NULL,
+        codec VARCHAR(10) NOT NULL,
+        size INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (session_id, kind)
+    )
+    ''')
+    
     conn.commit()
+    
+    # Versioned schema changes (indexes, denormalized counts) on top of the base tables
+    migrate(conn)
     conn.close()
 
 # Initialize the database
 init_db()
 
+# Load the whisper model in the background so the first request doesn't pay for it
+if WHISPER_PRELOAD:
+    threading.Thread(target=preload_model, args=(WHISPER_MODEL_SIZE, WHISPER_DEVICE, None, OPENAI_WHISPER), daemon=True).start()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+class ThreadConnection(sqlite3.Connection):
+    # Each thread keeps its connection open; close() just drops uncommitted work
+    # so callers can keep the open/close pattern
+    def close(self):
+        self.rollback()
+
+db_local = threading.local()
+
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = getattr(db_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DATABASE, factory=ThreadConnection)
+        conn.row_factory = sqlite3.Row
+        configure_connection(conn)
+        db_local.conn = conn
     return conn
 
 def is_authenticated():
@@ -173,6 +215,34 @@ def download_youtube_video(youtube_url, cookies_file=None):
         print(f"Unexpected error: {e}")
         return None
 
+# Translate transcript text to English with Gemini, in batches that fit one prompt
+def translate_with_gemini(texts, language):
+    batches, batch = [], []
+    for text in texts:
+        if batch and sum(len(t) for t in batch) + len(text) > TRANSLATION_BATCH_CHARS:
+            batches.append(batch)
+            batch = []
+        batch.append(text)
+    if batch:
+        batches.append(batch)
+
+    translated = []
+    for batch in batches:
+        prompt = f"Translate the following transcript from language '{language}' into English. Reply with the translation only.\n\n" + "\n".join(batch)
+        # Translation happens while processing, so it waits for a free slot
+        translated.append(llm.generate(prompt, max_output_tokens=8192, block=True).strip())
+    return "\n".join(translated)
+
+# Text translators for non-English audio; 'whisper' instead runs Whisper's
+# translate task on the audio, which costs a second recognition pass
+TRANSLATORS = {
+    'gemini': translate_with_gemini,
+}
+
+# A misspelt setting would otherwise pass untranslated text off as English
+if TRANSLATOR != 'whisper' and TRANSLATOR not in TRANSLATORS:
+    raise ValueError(f"Unknown TRANSLATOR {TRANSLATOR!r}; use 'whisper' or one of {sorted(TRANSLATORS)}")
+
 # Function to transcribe video using Whisper with timestamps and translation if necessary
 def transcribe_video(file_path):
     try:
@@ -180,38 +250,42 @@ def transcribe_video(file_path):
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Video file not found: {file_path}")
 
-        # Extract audio from video
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio_file:
-            video = VideoFileClip(file_path)
-            video.audio.write_audiofile(temp_audio_file.name, codec='pcm_s16le', fps=16000)
-            video.audio.close()
-            video.close()
-
-            # Load Whisper model (base for speed/accuracy balance)
-            whisper_model = whisper.load_model("base")
-
-            # Transcribe audio in original language
-            result = whisper_model.transcribe(temp_audio_file.name, task="transcribe")
-            original_text = result['text']
-            segments = result['segments']
-            language = result['language']
-
+        # Audio is streamed out of FFmpeg window by window instead of being written
+        # to a temporary WAV; the language detected in the first window is reused
+        detected = {}
+        original_parts = []
+        english_parts = []
+
+        def transcribe_window(audio):
+            result = whisper_model.transcribe(audio, task="transcribe", language=detected.get('language'))
+            detected.setdefault('language', result['language'])
+            original_parts.append(result['text'].strip())
+            if TRANSLATOR == 'whisper' and detected['language'] != 'en':
+                english_parts.append(whisper_model.transcribe(audio, task="translate", language=detected['language'])['text'])
+            return result['segments']
+
+        # Shared Whisper model (base for speed/accuracy balance), loaded once per process
+        with use_model(WHISPER_MODEL_SIZE, WHISPER_DEVICE, None, OPENAI_WHISPER) as whisper_model:
             # Format original transcript with timestamps
             formatted_transcript = "\n".join(
                 f"[{str(timedelta(seconds=int(segment['start'])))} - {str(timedelta(seconds=int(segment['end'])))}] {segment['text'].strip()}"
-                for segment in segments
+                for segment in transcribe_stream(file_path, transcribe_window)
             )
-
-            # Get English translation if not English
-            if language != 'en':
-                translation_result = whisper_model.transcribe(temp_audio_file.name, task="translate")
-                english_text = translation_result['text']
-            else:
+        language = detected.get('language')
+        original_text = " ".join(part for part in original_parts if part)
+
+        # Get English translation if not English, from the transcript text alone
+        if language == 'en':
+            english_text = original_text
+        elif TRANSLATOR == 'whisper':
+            english_text = "".join(english_parts)
+        else:
+            try:
+                english_text = TRANSLATORS[TRANSLATOR](original_parts, language)
+            except Exception as e:
+                print(f"Translation error: {e}")
                 english_text = original_text
 
-        # Clean up temporary file
-        os.unlink(temp_audio_file.name)
-
         # Return formatted original transcript, English text, and language
         if not formatted_transcript.strip():
             return "No transcription available.", None, None
@@ -224,8 +298,7 @@ def transcribe_video(file_path):
 def summarize_text(english_transcript):
     try:
         prompt = f"You are a helpful assistant that provides concise and informative summaries of video content. Please provide a summary of the following transcript:\n\n{english_transcript}"
-        response = model.generate_content(prompt, generation_config={"max_output_tokens": 500})
-        return response.text
+        return llm.generate(prompt, max_output_tokens=500)
     except Exception as e:
         print(f"Summarization error: {e}")
         return "Error in summarization process."
@@ -234,12 +307,29 @@ def summarize_text(english_transcript):
 def answer_question(english_transcript, question):
     try:
         prompt = f"You are a helpful assistant that answers questions based on video transcripts. Based on the following transcript, please answer this question: '{question}'\n\nTranscript: {english_transcript}"
-        response = model.generate_content(prompt, generation_config={"max_output_tokens": 500})
-        return response.text
+        return llm.generate(prompt, max_output_tokens=500)
     except Exception as e:
         print(f"Question answering error: {e}")
         return "Error in processing your question."
 
+# Sessions stored here keep their transcript and summary inline; app.py moves them (and
+# stores its own sessions) into session_blob, with the transcript as a segment table
+def load_blob(cursor, session_id, kind):
+    cursor.execute("SELECT codec, data FROM session_blob WHERE session_id = ? AND kind = ?", (session_id, kind))
+    row = cursor.fetchone()
+    return blob_store.decompress(row['codec'], row['data']) if row else None
+
+def load_transcript(cursor, session_id, inline):
+    if inline is not None:
+        return inline
+    data = load_blob(cursor, session_id, blob_store.SEGMENTS)
+    if data is not None:
+        return SegmentTable.loads(data).render()
+    return load_blob(cursor, session_id, blob_store.TRANSCRIPT)
+
+def load_summary(cursor, session_id, inline):
+    return inline if inline is not None else load_blob(cursor, session_id, blob_store.SUMMARY)
+
 # Routes
 @app.route('/')
 def index():
@@ -254,7 +344,8 @@ def index():
 
 @app.route('/uploads/<filename>')
 def serve_uploaded_file(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    # Byte ranges, validators and caching headers so video seeking never re-downloads the file
+    return serve_media(UPLOAD_FOLDER, filename)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -454,6 +545,8 @@ def get_results(session_id):
     
     # Convert to dictionary
     session_dict = dict(session_data)
+    session_dict['transcript'] = load_transcript(cursor, session_id, session_dict['transcript'])
+    session_dict['summary'] = load_summary(cursor, session_id, session_dict['summary'])
     conversation_list = [dict(conv) for conv in conversations]
     
     conn.close()
@@ -541,7 +634,7 @@ def download_transcript(session_id):
         conn.close()
         return jsonify({"message": "Unauthorized"}), 403
     
-    transcript = session_data['transcript']
+    transcript = load_transcript(cursor, session_id, session_data['transcript'])
     title = session_data['title']
     
     conn.close()
@@ -581,13 +674,10 @@ def get_history():
     
     # Get all sessions for this user
     cursor.execute("""
-    SELECT s.id, s.title, s.timestamp, s.is_youtube, s.youtube_id, s.video_path, 
-           COUNT(c.id) as conversation_count
-    FROM session s
-    LEFT JOIN conversation c ON s.id = c.session_id
-    WHERE s.user_id = ?
-    GROUP BY s.id
-    ORDER BY s.timestamp DESC
+    SELECT id, title, timestamp, is_youtube, youtube_id, video_path, conversation_count
+    FROM session
+    WHERE user_id = ?
+    ORDER BY timestamp DESC
     """, (user_id,))
     
     sessions = cursor.fetchall()
@@ -629,6 +719,7 @@ def delete_session(session_id):
     cursor.execute("DELETE FROM conversation WHERE session_id = ?", (session_id,))
     
     # Delete session
+    cursor.execute("DELETE FROM session_blob WHERE session_id = ?", (session_id,))
     cursor.execute("DELETE FROM session WHERE id = ?", (session_id,))
     
     conn.commit()
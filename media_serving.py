@@ -0,0 +1,114 @@
+import hashlib
+import os
+
+from flask import Response, abort, request
+from werkzeug.http import http_date, parse_range_header
+from werkzeug.security import safe_join
+
+# Uploaded media is written once and never modified, so a stat-derived ETag identifies
+# the bytes exactly and can be used as a strong validator for ranges
+MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', 86400))
+READ_CHUNK = 256 * 1024
+
+# Optional offload to a fronting proxy: 'x-accel' (nginx) or 'x-sendfile' (Apache, lighttpd).
+# The proxy then serves ranges and caching itself and no Python worker streams bytes
+MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', '').lower()
+X_ACCEL_PREFIX = os.environ.get('X_ACCEL_PREFIX', '/protected-uploads/')
+
+MIME_TYPES = {
+    'mp4': 'video/mp4',
+    'webm': 'video/webm',
+    'mkv': 'video/x-matroska',
+    'mov': 'video/quicktime',
+    'avi': 'video/x-msvideo',
+    'm4a': 'audio/mp4',
+    'mp3': 'audio/mpeg',
+}
+
+
+def media_etag(stat):
+    return hashlib.sha1(f"{stat.st_ino}-{stat.st_size}-{stat.st_mtime_ns}".encode()).hexdigest()
+
+
+def _read_range(path, start, length):
+    # Fallback when the server has no wsgi.file_wrapper: read exactly the range
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(READ_CHUNK, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def _file_body(path, start, length):
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if file_wrapper is None:
+        return _read_range(path, start, length)
+    # The server sends from the current offset for Content-Length bytes, with
+    # sendfile(2) where it can (e.g. gunicorn), so the bytes never enter Python
+    f = open(path, 'rb')
+    f.seek(start)
+    return file_wrapper(f, READ_CHUNK)
+
+
+def _requested_range(etag, last_modified, size):
+    header = request.headers.get('Range')
+    if not header:
+        return None
+    # If-Range: only honour the range if the client's copy is still current
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range.strip() not in (f'"{etag}"', http_date(last_modified)):
+        return None
+    parsed = parse_range_header(header)
+    if parsed is None or parsed.units != 'bytes' or len(parsed.ranges) != 1:
+        # Multipart ranges aren't worth it for video; send the whole file instead
+        return None
+    return parsed.range_for_length(size) or (size, size)
+
+
+def serve_media(directory, filename):
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    stat = os.stat(path)
+    etag = media_etag(stat)
+    last_modified = int(stat.st_mtime)
+    mimetype = MIME_TYPES.get(filename.rsplit('.', 1)[-1].lower(), 'application/octet-stream')
+
+    headers = {
+        'ETag': f'"{etag}"',
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': f'private, max-age={MEDIA_MAX_AGE}',
+        'Accept-Ranges': 'bytes',
+    }
+
+    if MEDIA_OFFLOAD == 'x-accel':
+        headers['X-Accel-Redirect'] = X_ACCEL_PREFIX + os.path.basename(path)
+        return Response(status=200, headers=headers, mimetype=mimetype)
+    if MEDIA_OFFLOAD == 'x-sendfile':
+        headers['X-Sendfile'] = os.path.abspath(path)
+        return Response(status=200, headers=headers, mimetype=mimetype)
+
+    if_none_match = request.if_none_match
+    if if_none_match and if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    if not if_none_match and request.if_modified_since and int(request.if_modified_since.timestamp()) >= last_modified:
+        return Response(status=304, headers=headers)
+
+    size = stat.st_size
+    byte_range = _requested_range(etag, last_modified, size)
+    if byte_range is None:
+        start, end, status = 0, size, 200
+    else:
+        start, end = byte_range
+        if start >= size:
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+    headers['Content-Length'] = str(end - start)
+
+    return Response(_file_body(path, start, end - start), status=status, headers=headers,
+                    mimetype=mimetype, direct_passthrough=True)
@@ -0,0 +1,69 @@
+import os
+
+from sqlalchemy import text
+
+# Uploaded media is stored once per distinct content, named by its SHA-256, and shared by
+# every session that uploaded the same bytes. refcount is the number of those sessions
+
+
+def create_table(conn):
+    conn.execute(text('''
+    CREATE TABLE IF NOT EXISTS media_object (
+        hash VARCHAR(64) PRIMARY KEY,
+        path VARCHAR(300) NOT NULL,
+        size INTEGER NOT NULL,
+        refcount INTEGER NOT NULL DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    '''))
+
+
+def content_path(folder, media_hash, filename):
+    extension = os.path.splitext(filename)[1].lower()
+    return os.path.normpath(os.path.join(folder, media_hash + extension)).replace(os.sep, '/')
+
+
+def add_reference(conn, folder, file_path, media_hash):
+    # Call inside the transaction that stores the session, and move the file with
+    # place_file() once it has committed: a rolled-back transaction then leaves the upload
+    # where it was, for a retry of the job, instead of a stored file with no row
+    conn.execute(text('''
+    INSERT INTO media_object (hash, path, size, refcount)
+    VALUES (:hash, :path, :size, 1)
+    ON CONFLICT (hash) DO UPDATE SET refcount = refcount + 1
+    '''), {'hash': media_hash, 'path': content_path(folder, media_hash, file_path),
+          'size': os.path.getsize(file_path)})
+    return conn.execute(text("SELECT path FROM media_object WHERE hash = :hash"), {'hash': media_hash}).scalar()
+
+
+def place_file(file_path, path):
+    # The committed reference keeps the shared file from being released meanwhile
+    if os.path.abspath(file_path) == os.path.abspath(path):
+        return
+    if os.path.exists(path):
+        # Same bytes already stored; the new copy is dropped
+        os.remove(file_path)
+    else:
+        os.replace(file_path, path)
+
+
+def release(conn, media_hash):
+    # Drops one reference and unlinks the file with the last one; same transaction rules as above
+    conn.execute(text("UPDATE media_object SET refcount = refcount - 1 WHERE hash = :hash"), {'hash': media_hash})
+    row = conn.execute(text("SELECT path, refcount FROM media_object WHERE hash = :hash"),
+                       {'hash': media_hash}).mappings().fetchone()
+    if not row or row['refcount'] > 0:
+        return False
+    conn.execute(text("DELETE FROM media_object WHERE hash = :hash"), {'hash': media_hash})
+    if os.path.exists(row['path']):
+        os.remove(row['path'])
+    return True
+
+
+def stats(conn):
+    row = conn.execute(text('''
+    SELECT COUNT(*) AS objects, COALESCE(SUM(size), 0) AS stored_bytes,
+           COALESCE(SUM(size * refcount), 0) AS referenced_bytes
+    FROM media_object
+    ''')).mappings().fetchone()
+    return dict(row)
@@ -0,0 +1,217 @@
+import os
+
+# Per-connection settings: WAL lets readers run alongside the writer, NORMAL sync is
+# durable across application crashes in WAL mode, and mmap serves reads from the page cache
+MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+BUSY_TIMEOUT_MS = 5000
+
+
+def configure_connection(conn):
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def _columns(cursor, table):
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _add_column(cursor, table, column, definition):
+    # Tables created after the column was added to their CREATE statement already have it
+    columns = _columns(cursor, table)
+    if columns and column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _add_indexes(cursor):
+    # /history lists a user's sessions newest first; /results lists a session's conversations
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_session_user_timestamp ON session (user_id, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_session_timestamp ON session (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversation_session ON conversation (session_id, timestamp)")
+
+
+def _add_conversation_count(cursor):
+    # Denormalized so /history doesn't join and group every conversation; the triggers keep
+    # it right for every writer of the database, including the older entry points
+    if 'conversation_count' not in _columns(cursor, 'session'):
+        cursor.execute("ALTER TABLE session ADD COLUMN conversation_count INTEGER NOT NULL DEFAULT 0")
+    cursor.execute('''
+    UPDATE session SET conversation_count = (
+        SELECT COUNT(*) FROM conversation c WHERE c.session_id = session.id
+    )
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS conversation_count_insert AFTER INSERT ON conversation
+    BEGIN
+        UPDATE session SET conversation_count = conversation_count + 1 WHERE id = NEW.session_id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS conversation_count_delete AFTER DELETE ON conversation
+    BEGIN
+        UPDATE session SET conversation_count = conversation_count - 1 WHERE id = OLD.session_id;
+    END
+    ''')
+
+
+def _add_keyset_indexes(cursor):
+    # Keyset pagination walks (timestamp, id) newest first; the id breaks timestamp ties
+    cursor.execute("DROP INDEX IF EXISTS idx_session_user_timestamp")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_session_user_timestamp_id ON session (user_id, timestamp, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contact_message_timestamp_id ON contact_message (timestamp, id)")
+
+    # Last change per listing, so paginated responses can carry Last-Modified
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS change_marker (
+        scope VARCHAR(50) PRIMARY KEY,
+        updated_at DATETIME NOT NULL
+    )
+    ''')
+    for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS session_change_{event.lower()} AFTER {event} ON session
+        BEGIN
+            INSERT OR REPLACE INTO change_marker (scope, updated_at) VALUES ('history:' || {row}.user_id, CURRENT_TIMESTAMP);
+        END
+        ''')
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS contact_message_change_{event.lower()} AFTER {event} ON contact_message
+        BEGIN
+            INSERT OR REPLACE INTO change_marker (scope, updated_at) VALUES ('contact', CURRENT_TIMESTAMP);
+        END
+        ''')
+
+
+def _primary_key(cursor, table):
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall() if row[5]]
+
+
+def _key_caches_by_language(cursor):
+    # A transcript in one language must not be served for another. Tables created before
+    # this are rebuilt with language in the primary key; their rows were all English
+    if _columns(cursor, 'transcript_cache') and 'language' not in _primary_key(cursor, 'transcript_cache'):
+        cursor.execute("ALTER TABLE transcript_cache RENAME TO transcript_cache_old")
+        cursor.execute('''
+        CREATE TABLE transcript_cache (
+            media_hash VARCHAR(64) NOT NULL,
+            model VARCHAR(50) NOT NULL,
+            language VARCHAR(10) NOT NULL,
+            transcript TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_access DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (media_hash, model, language)
+        )
+        ''')
+        cursor.execute('''
+        INSERT INTO transcript_cache (media_hash, model, language, transcript, size, created_at, last_access)
+        SELECT media_hash, model, 'en', transcript, size, created_at, last_access FROM transcript_cache_old
+        ''')
+        cursor.execute("DROP TABLE transcript_cache_old")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_transcript_cache_last_access ON transcript_cache (last_access)")
+
+    if _columns(cursor, 'youtube_cache') and 'language' not in _primary_key(cursor, 'youtube_cache'):
+        cursor.execute("ALTER TABLE youtube_cache RENAME TO youtube_cache_old")
+        cursor.execute('''
+        CREATE TABLE youtube_cache (
+            youtube_id VARCHAR(50) NOT NULL,
+            language VARCHAR(10) NOT NULL,
+            model VARCHAR(50) NOT NULL,
+            title VARCHAR(200),
+            codec VARCHAR(10),
+            segments BLOB,
+            summary TEXT,
+            playable_in_embed BOOLEAN,
+            video_path VARCHAR(200),
+            fetched_at REAL,
+            last_access DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (youtube_id, language)
+        )
+        ''')
+        cursor.execute('''
+        INSERT INTO youtube_cache (youtube_id, language, model, title, codec, segments, summary, playable_in_embed,
+                                   video_path, fetched_at, last_access)
+        SELECT youtube_id, COALESCE(language, 'en'), model, title, codec, segments, summary, playable_in_embed,
+               video_path, fetched_at, last_access
+        FROM youtube_cache_old
+        ''')
+        cursor.execute("DROP TABLE youtube_cache_old")
+
+
+def _add_word_timestamps_flag(cursor):
+    # Whether cached transcripts carry word timings; without them an entry can't serve a
+    # request that wants them. Packed segment tables only have a "words" key when they do
+    if _columns(cursor, 'transcript_cache') and 'word_timestamps' not in _columns(cursor, 'transcript_cache'):
+        cursor.execute("ALTER TABLE transcript_cache ADD COLUMN word_timestamps BOOLEAN NOT NULL DEFAULT 0")
+        cursor.execute("UPDATE transcript_cache SET word_timestamps = 1 WHERE transcript LIKE '%\"words\":%'")
+    if _columns(cursor, 'youtube_cache') and 'word_timestamps' not in _columns(cursor, 'youtube_cache'):
+        cursor.execute("ALTER TABLE youtube_cache ADD COLUMN word_timestamps BOOLEAN NOT NULL DEFAULT 0")
+
+
+def _add_transcription_backend(cursor):
+    # Device, compute type and model each session was transcribed with (JSON)
+    _add_column(cursor, 'session', 'transcription_backend', 'TEXT')
+
+
+def _add_search_indexed(cursor):
+    # Sessions not yet in the full-text index; they are backfilled at startup
+    _add_column(cursor, 'session', 'search_indexed', 'BOOLEAN NOT NULL DEFAULT 0')
+
+
+def _add_media_hash(cursor):
+    # Content hash of an uploaded file; sessions with the same hash share it (media_store.py)
+    _add_column(cursor, 'session', 'media_hash', 'VARCHAR(64)')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_session_media_hash ON session (media_hash)")
+
+
+def _add_job_claim(cursor):
+    # Token of the worker running a job, so a requeued job's old worker can't finish it
+    _add_column(cursor, 'job', 'claimed_by', 'VARCHAR(100)')
+
+
+def _drop_session_index(cursor):
+    # Chunk indexes are kept compressed in session_blob now; sessions whose index was in
+    # this table are re-indexed from their segments on their next question
+    cursor.execute("DROP TABLE IF EXISTS session_index")
+
+
+# Applied in order; the schema version is kept in PRAGMA user_version
+MIGRATIONS = [
+    (1, _add_indexes),
+    (2, _add_conversation_count),
+    (3, _add_keyset_indexes),
+    (4, _key_caches_by_language),
+    (5, _add_word_timestamps_flag),
+    (6, _add_transcription_backend),
+    (7, _add_search_indexed),
+    (8, _add_media_hash),
+    (9, _add_job_claim),
+    (10, _drop_session_index),
+]
+
+
+def migrate(conn):
+    # Expects the base tables to exist. BEGIN IMMEDIATE takes the write lock up front so
+    # processes starting together apply each migration exactly once
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for target, step in MIGRATIONS:
+            if target > version:
+                step(cursor)
+                cursor.execute(f"PRAGMA user_version={target}")
+                version = target
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return version
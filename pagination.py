@@ -0,0 +1,57 @@
+import base64
+import datetime
+import hashlib
+import json
+
+from flask import jsonify, request
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value) if value else default
+    except ValueError:
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(row):
+    # Opaque to clients: the (timestamp, id) of the last row on the page
+    raw = json.dumps([row['timestamp'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    return timestamp, row_id
+
+
+def split_page(rows, limit):
+    # Queries fetch limit + 1 rows; the extra one only tells us another page exists
+    rows = [dict(row) for row in rows]
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+def parse_timestamp(value):
+    if not value:
+        return None
+    return datetime.datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S').replace(tzinfo=datetime.timezone.utc)
+
+
+def page_response(payload, last_modified=None):
+    # Clients revalidate every time; unchanged pages come back as an empty 304
+    response = jsonify(payload)
+    response.set_etag(hashlib.sha256(response.get_data()).hexdigest())
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
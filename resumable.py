@@ -0,0 +1,72 @@
+import hashlib
+import os
+import threading
+
+# Resumable uploads (create, PATCH at an offset, finalize) write straight into the
+# final file and hash the bytes as they arrive, so finalize needs no second pass
+CHUNK_READ = 1024 * 1024
+
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def create_file(path):
+    with open(path, 'wb'):
+        pass
+
+
+def _hasher(upload_id, path, offset):
+    # The running hash lives in memory; after a restart, or if the upload moved to
+    # another worker process, it is rebuilt once from the bytes already on disk
+    with _hashers_lock:
+        state = _hashers.pop(upload_id, None)
+    if state is not None and state[0] == offset:
+        return state[1]
+    digest = hashlib.sha256()
+    remaining = offset
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(min(CHUNK_READ, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+
+def write_chunk(upload_id, path, offset, stream, limit):
+    # Appends up to limit bytes from stream at offset and returns the new offset.
+    # Whatever arrived before a dropped connection is kept, so the client resumes there
+    digest = _hasher(upload_id, path, offset)
+    written = 0
+    with open(path, 'r+b') as f:
+        # Anything past the acknowledged offset is left over from an interrupted request
+        f.seek(offset)
+        f.truncate()
+        try:
+            while written < limit:
+                block = stream.read(min(CHUNK_READ, limit - written))
+                if not block:
+                    break
+                f.write(block)
+                digest.update(block)
+                written += len(block)
+        except Exception as e:
+            print(f"Upload {upload_id} interrupted at offset {offset + written}: {e}")
+        f.flush()
+        os.fsync(f.fileno())
+    with _hashers_lock:
+        _hashers[upload_id] = (offset + written, digest)
+    return offset + written
+
+
+def finish(upload_id, path, size):
+    digest = _hasher(upload_id, path, size)
+    return digest.hexdigest()
+
+
+def discard(upload_id, path=None):
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+    if path and os.path.exists(path):
+        os.remove(path)
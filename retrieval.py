@@ -0,0 +1,104 @@
+import math
+import re
+from collections import Counter
+from datetime import timedelta
+
+# Segments are grouped into chunks of roughly this many words before indexing
+CHUNK_WORDS = 120
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TRANSCRIPT_LINE = re.compile(r'^\[(\d+):(\d\d):(\d\d) - (\d+):(\d\d):(\d\d)\] ?(.*)$')
+WORD = re.compile(r"[a-z0-9']+")
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'did', 'do', 'does', 'for', 'from', 'has',
+    'have', 'he', 'her', 'his', 'how', 'i', 'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or', 'our',
+    'she', 'so', 'that', 'the', 'their', 'them', 'there', 'they', 'this', 'to', 'was', 'we', 'were',
+    'what', 'when', 'where', 'which', 'who', 'why', 'will', 'with', 'you', 'your',
+}
+
+
+def tokenize(text):
+    return [word for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def parse_transcript(transcript):
+    segments = []
+    for line in transcript.splitlines():
+        match = TRANSCRIPT_LINE.match(line.strip())
+        if match:
+            h1, m1, s1, h2, m2, s2, segment_text = match.groups()
+            segments.append({
+                'start': int(h1) * 3600 + int(m1) * 60 + int(s1),
+                'end': int(h2) * 3600 + int(m2) * 60 + int(s2),
+                'text': segment_text,
+            })
+    return segments
+
+
+def build_chunks(segments, max_words=CHUNK_WORDS):
+    chunks = []
+    current = []
+    words = 0
+    for segment in segments:
+        current.append(segment)
+        words += len(segment['text'].split())
+        if words >= max_words:
+            chunks.append(current)
+            current, words = [], 0
+    if current:
+        chunks.append(current)
+    return [
+        {'start': chunk[0]['start'], 'end': chunk[-1]['end'], 'text': ' '.join(s['text'].strip() for s in chunk)}
+        for chunk in chunks
+    ]
+
+
+def build_index(chunks):
+    # Plain JSON-serializable structure so it can be stored next to the session
+    terms = [Counter(tokenize(chunk['text'])) for chunk in chunks]
+    doc_freq = Counter()
+    for chunk_terms in terms:
+        doc_freq.update(chunk_terms.keys())
+    lengths = [sum(chunk_terms.values()) for chunk_terms in terms]
+    return {
+        'chunks': chunks,
+        'terms': [dict(chunk_terms) for chunk_terms in terms],
+        'lengths': lengths,
+        'doc_freq': dict(doc_freq),
+        'avg_length': (sum(lengths) / len(lengths)) if lengths else 0,
+    }
+
+
+def index_segments(segments):
+    return build_index(build_chunks(list(segments)))
+
+
+def search(index, query, k=5):
+    chunks = index['chunks']
+    if len(chunks) <= k:
+        return chunks
+    total = len(chunks)
+    avg_length = index['avg_length'] or 1
+    scores = []
+    for i, chunk_terms in enumerate(index['terms']):
+        score = 0.0
+        length = index['lengths'][i]
+        for term in set(tokenize(query)):
+            tf = chunk_terms.get(term)
+            if not tf:
+                continue
+            df = index['doc_freq'][term]
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+        scores.append((score, i))
+    top = sorted(scores, key=lambda item: (-item[0], item[1]))[:k]
+    # Hand the excerpts to the model in playback order
+    return [chunks[i] for _, i in sorted(top, key=lambda item: item[1])]
+
+
+def format_chunks(chunks):
+    return "\n".join(
+        f"[{str(timedelta(seconds=int(chunk['start'])))} - {str(timedelta(seconds=int(chunk['end'])))}] {chunk['text']}"
+        for chunk in chunks
+    )
@@ -0,0 +1,73 @@
+import re
+
+from sqlalchemy import text
+
+# One FTS5 row per transcript segment. owner holds "u<user_id>" as an indexed token so
+# the user filter is part of the MATCH instead of a scan over every user's hits
+SEARCH_LIMIT = 20
+SNIPPET_TOKENS = 16
+BACKFILL_BATCH = 50
+TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def create_table(conn):
+    conn.execute(text('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS segment_fts USING fts5(
+        owner,
+        text,
+        session_id UNINDEXED,
+        start UNINDEXED,
+        end UNINDEXED,
+        tokenize = 'porter unicode61'
+    )
+    '''))
+
+
+def index_segments(conn, session_id, user_id, segments):
+    conn.execute(text("DELETE FROM segment_fts WHERE session_id = :id"), {'id': session_id})
+    rows = [
+        {'owner': f"u{user_id}", 'text': segment['text'].strip(), 'session_id': session_id,
+         'start': segment['start'], 'end': segment['end']}
+        for segment in segments if segment['text'].strip()
+    ]
+    if rows:
+        conn.execute(text('''
+        INSERT INTO segment_fts (owner, text, session_id, start, end)
+        VALUES (:owner, :text, :session_id, :start, :end)
+        '''), rows)
+
+
+def remove_session(conn, session_id):
+    conn.execute(text("DELETE FROM segment_fts WHERE session_id = :id"), {'id': session_id})
+
+
+def match_query(query):
+    # User input is reduced to quoted terms (all required, the last one as a prefix)
+    # so FTS5 operators and punctuation in it can't produce a syntax error
+    terms = TERM.findall(query.lower())
+    if not terms:
+        return None
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += '*'
+    return " ".join(phrases)
+
+
+def search(conn, user_id, query, limit=SEARCH_LIMIT):
+    match = match_query(query)
+    if match is None:
+        return []
+    rows = conn.execute(text('''
+    SELECT hit.session_id, hit.start, hit.end, hit.snippet, s.title, s.timestamp
+    FROM (
+        SELECT session_id, start, end,
+               snippet(segment_fts, 1, '<mark>', '</mark>', '…', :tokens) AS snippet,
+               bm25(segment_fts, 0.0, 1.0) AS score
+        FROM segment_fts
+        WHERE segment_fts MATCH :match
+        ORDER BY score
+        LIMIT :limit
+    ) hit
+    JOIN session s ON s.id = hit.session_id
+    ORDER BY hit.score
+    '''), {'match': f'owner:"u{user_id}" AND text:({match})', 'tokens': SNIPPET_TOKENS, 'limit': limit})
+    return [dict(row) for row in rows.mappings().fetchall()]
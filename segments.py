@@ -0,0 +1,136 @@
+import json
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+from retrieval import parse_transcript
+
+# Segments are kept column by column with times in integer milliseconds; the
+# "[h:mm:ss - h:mm:ss] text" form is only rendered when something asks for it
+FORMAT_VERSION = 1
+EMPTY_TRANSCRIPT = "No transcription available."
+
+
+def to_ms(seconds):
+    return int(round(seconds * 1000))
+
+
+def format_line(start_ms, end_ms, text):
+    return f"[{str(timedelta(seconds=start_ms // 1000))} - {str(timedelta(seconds=end_ms // 1000))}] {text}"
+
+
+def format_cue_time(ms, separator):
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{ms:03d}"
+
+
+class SegmentTable:
+    def __init__(self, start_ms, end_ms, text, confidence, words=None):
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.text = text
+        self.confidence = confidence
+        # Per segment: None, or [start_ms, end_ms, word, probability] rows
+        self.words = words or [None] * len(start_ms)
+        # Running maximum of end times, so overlap queries can bisect as well
+        self._max_end = []
+        for end in end_ms:
+            self._max_end.append(max(end, self._max_end[-1]) if self._max_end else end)
+
+    @classmethod
+    def from_segments(cls, segments):
+        # segments: dicts with start/end in seconds, text and optional confidence/words
+        columns = ([], [], [], [], [])
+        for segment in segments:
+            text = segment['text'].strip()
+            if not text:
+                continue
+            columns[0].append(to_ms(segment['start']))
+            columns[1].append(to_ms(segment['end']))
+            columns[2].append(text)
+            columns[3].append(segment.get('confidence'))
+            words = segment.get('words')
+            columns[4].append([[to_ms(w['start']), to_ms(w['end']), w['word'], w.get('probability')] for w in words]
+                              if words else None)
+        return cls(*columns)
+
+    @classmethod
+    def loads(cls, data):
+        if not data or not data.lstrip().startswith('{'):
+            # Transcripts stored before segments were kept as a formatted string
+            if data == EMPTY_TRANSCRIPT:
+                data = ''
+            return cls.from_segments(parse_transcript(data or ''))
+        table = json.loads(data)
+        return cls(table['start_ms'], table['end_ms'], table['text'], table['confidence'], table.get('words'))
+
+    def dumps(self):
+        table = {'version': FORMAT_VERSION, 'start_ms': self.start_ms, 'end_ms': self.end_ms,
+                 'text': self.text, 'confidence': self.confidence}
+        if any(self.words):
+            table['words'] = self.words
+        return json.dumps(table, separators=(',', ':'), ensure_ascii=False)
+
+    def __len__(self):
+        return len(self.start_ms)
+
+    def segment(self, i):
+        segment = {'start': self.start_ms[i] / 1000, 'end': self.end_ms[i] / 1000, 'text': self.text[i],
+                   'confidence': self.confidence[i]}
+        if self.words[i]:
+            segment['words'] = [{'start': w[0] / 1000, 'end': w[1] / 1000, 'word': w[2], 'probability': w[3]}
+                                for w in self.words[i]]
+        return segment
+
+    def __iter__(self):
+        # Same dict shape the transcriber produces, so retrieval and indexing take either
+        return (self.segment(i) for i in range(len(self)))
+
+    def at(self, ms):
+        # Index of the segment playing at ms, or None between segments
+        i = bisect_right(self.start_ms, ms) - 1
+        if i >= 0 and self.end_ms[i] >= ms:
+            return i
+        return None
+
+    def between(self, start_ms, end_ms):
+        # Indexes of the segments overlapping [start_ms, end_ms]
+        first = bisect_left(self._max_end, start_ms)
+        last = bisect_right(self.start_ms, end_ms)
+        return [i for i in range(first, last) if self.end_ms[i] >= start_ms]
+
+    def rows(self, indexes=None):
+        # JSON-friendly rows for the API
+        indexes = range(len(self)) if indexes is None else indexes
+        return [
+            {'start_ms': self.start_ms[i], 'end_ms': self.end_ms[i], 'text': self.text[i],
+             'confidence': self.confidence[i], 'words': self.words[i]}
+            for i in indexes
+        ]
+
+    def iter_lines(self):
+        for i in range(len(self)):
+            yield format_line(self.start_ms[i], self.end_ms[i], self.text[i])
+
+    def render(self):
+        return "\n".join(self.iter_lines()) or EMPTY_TRANSCRIPT
+
+    # Subtitle and JSON renderings are generators so downloads can stream them
+    def iter_srt(self):
+        for i in range(len(self)):
+            yield (f"{i + 1}\n{format_cue_time(self.start_ms[i], ',')} --> {format_cue_time(self.end_ms[i], ',')}\n"
+                   f"{self.text[i]}\n\n")
+
+    def iter_vtt(self):
+        yield "WEBVTT\n\n"
+        for i in range(len(self)):
+            yield f"{format_cue_time(self.start_ms[i], '.')} --> {format_cue_time(self.end_ms[i], '.')}\n{self.text[i]}\n\n"
+
+    def iter_json(self, **fields):
+        # {"<field>": ..., "segments": [...]} written one segment at a time
+        head = json.dumps(fields, ensure_ascii=False)[:-1]
+        yield head + (', ' if fields else '') + '"segments": ['
+        for i in range(len(self)):
+            yield (',' if i else '') + json.dumps(self.rows([i])[0], ensure_ascii=False)
+        yield ']}'
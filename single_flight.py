@@ -0,0 +1,142 @@
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+# Coalesces identical work (same media hash, same YouTube id): the first caller produces
+# the result and later callers wait for it and read it instead of repeating the work.
+# Threads of one process wait on an Event; other processes see the leader's lease row in
+# SQLite and poll until the result can be looked up or the lease is gone
+LEASE_SECONDS = 120
+POLL_INTERVAL = 1
+WAIT_REPORT_SECONDS = 60
+
+
+def create_table(conn):
+    conn.execute(text('''
+    CREATE TABLE IF NOT EXISTS flight (
+        key VARCHAR(120) PRIMARY KEY,
+        owner VARCHAR(120) NOT NULL,
+        lease_until REAL NOT NULL
+    )
+    '''))
+
+
+class SingleFlight:
+    def __init__(self, engine, lease_seconds=LEASE_SECONDS, poll_interval=POLL_INTERVAL):
+        self.engine = engine
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.process = f"{socket.gethostname()}:{os.getpid()}"
+        self.lock = threading.Lock()
+        # key -> Event set when this process's leader for the key is done
+        self.local = {}
+        self.counts = {'produced': 0, 'coalesced': 0}
+
+    def _claim(self, key, owner):
+        now = time.time()
+        with self.engine.connect() as conn:
+            # A lease left by a dead process expires and is taken over
+            claimed = conn.execute(text('''
+            INSERT INTO flight (key, owner, lease_until) VALUES (:key, :owner, :until)
+            ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, lease_until = excluded.lease_until
+            WHERE lease_until < :now
+            '''), {'key': key, 'owner': owner, 'until': now + self.lease_seconds, 'now': now}).rowcount
+            conn.commit()
+        return claimed > 0
+
+    def _renew(self, key, owner):
+        with self.engine.connect() as conn:
+            conn.execute(text("UPDATE flight SET lease_until = :until WHERE key = :key AND owner = :owner"),
+                         {'until': time.time() + self.lease_seconds, 'key': key, 'owner': owner})
+            conn.commit()
+
+    def _release(self, key, owner):
+        with self.engine.connect() as conn:
+            conn.execute(text("DELETE FROM flight WHERE key = :key AND owner = :owner"), {'key': key, 'owner': owner})
+            conn.commit()
+
+    def _heartbeat(self, key, owner, stop):
+        # Keeps the lease alive for as long as the leader works, however long that is
+        while not stop.wait(self.lease_seconds / 3):
+            try:
+                self._renew(key, owner)
+            except Exception as e:
+                print(f"Could not renew lease on {key}: {e}")
+
+    def _local_slot(self, key):
+        with self.lock:
+            event = self.local.get(key)
+            if event is not None:
+                return event, False
+            event = self.local[key] = threading.Event()
+            return event, True
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def _finish_local(self, key):
+        with self.lock:
+            self.local.pop(key).set()
+
+    @contextmanager
+    def hold(self, key, lookup, on_wait=None):
+        # Yields lookup()'s result when there is one, possibly after waiting for the caller
+        # producing it. Otherwise yields None with the lease held until the block exits; the
+        # block should produce the result so that lookup() finds it. If it fails, the next
+        # waiter becomes the leader and tries again
+        waited = False
+        while True:
+            result = lookup()
+            if result is not None:
+                if waited:
+                    self._count('coalesced')
+                yield result
+                return
+            event, first = self._local_slot(key)
+            if first:
+                break
+            waited = True
+            if on_wait:
+                on_wait()
+            while not event.wait(WAIT_REPORT_SECONDS):
+                if on_wait:
+                    on_wait()
+
+        # This thread now stands for the whole process
+        owner = f"{self.process}:{threading.get_ident()}"
+        try:
+            reported = None
+            while not self._claim(key, owner):
+                # Another process holds the lease; poll for its result
+                result = lookup()
+                if result is not None:
+                    self._count('coalesced')
+                    yield result
+                    return
+                if on_wait and (reported is None or time.time() - reported >= WAIT_REPORT_SECONDS):
+                    reported = time.time()
+                    on_wait()
+                time.sleep(self.poll_interval)
+
+            stop = threading.Event()
+            threading.Thread(target=self._heartbeat, args=(key, owner, stop), daemon=True).start()
+            try:
+                # The previous holder may have finished between the lookup and the claim
+                result = lookup()
+                if result is None:
+                    self._count('produced')
+                yield result
+            finally:
+                stop.set()
+                self._release(key, owner)
+        finally:
+            self._finish_local(key)
+
+    def stats(self):
+        with self.lock:
+            return {**self.counts, 'in_flight': len(self.local)}
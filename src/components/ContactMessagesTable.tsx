@@ -9,7 +9,7 @@ import {
   TableRow 
 } from "@/components/ui/table";
 import { Button } from '@/components/ui/button';
-import { api } from '@/utils/api';
+import { api, getContactMessages } from '@/utils/api';
 import { toast } from 'sonner';
 import { Trash, Check, Eye, EyeOff } from 'lucide-react';
 
@@ -25,6 +25,8 @@ interface ContactMessage {
 const ContactMessagesTable: React.FC = () => {
   const [messages, setMessages] = useState<ContactMessage[]>([]);
   const [isLoading, setIsLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchMessages();
@@ -33,9 +35,9 @@ const ContactMessagesTable: React.FC = () => {
   const fetchMessages = async () => {
     setIsLoading(true);
     try {
-      // Updated to call the correct endpoint: '/contact'
-      const data = await api('/contact');
+      const data = await getContactMessages();
       setMessages(data.messages || []);
+      setNextCursor(data.next_cursor || null);
     } catch (error) {
       console.error('Error fetching contact messages:', error);
       toast.error('Failed to load contact messages');
@@ -44,6 +46,22 @@ const ContactMessagesTable: React.FC = () => {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+
+    setIsLoadingMore(true);
+    try {
+      const data = await getContactMessages(nextCursor);
+      setMessages(prevMessages => [...prevMessages, ...(data.messages || [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (error) {
+      console.error('Error fetching contact messages:', error);
+      toast.error('Failed to load contact messages');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const handleToggleRead = async (messageId: number) => {
     try {
       await api(`/mark_message/${messageId}`);
@@ -165,6 +183,13 @@ const ContactMessagesTable: React.FC = () => {
               ))}
             </TableBody>
           </Table>
+          {nextCursor && (
+            <div className="p-4 text-center border-t">
+              <Button variant="outline" size="sm" onClick={loadMore} disabled={isLoadingMore}>
+                {isLoadingMore ? 'Loading...' : 'Load more'}
+              </Button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -3,7 +3,7 @@ import React, { useState, useRef, useEffect } from 'react';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Card } from '@/components/ui/card';
-import { askQuestion } from '@/utils/api';
+import { askQuestionStream } from '@/utils/api';
 import { Send, User, Bot } from 'lucide-react';
 import { toast } from 'sonner';
 
@@ -37,24 +37,32 @@ const QASection: React.FC<QASectionProps> = ({ sessionId, initialMessages = [] }
     
     setIsLoading(true);
     
+    // Add user question immediately to provide instant feedback
+    const pendingMessage: Conversation = {
+      id: Date.now(),
+      question: question,
+      answer: '...',
+      timestamp: new Date().toISOString(),
+    };
+    
     try {
-      // Add user question immediately to provide instant feedback
-      const pendingMessage: Conversation = {
-        id: Date.now(),
-        question: question,
-        answer: '...',
-        timestamp: new Date().toISOString(),
-      };
-      
       setMessages(prevMessages => [...prevMessages,pendingMessage]);
       
       // Clear input field right away
       setQuestion('');
       
-      // Make API call
-      const data = await askQuestion(sessionId, pendingMessage.question);
+      // Stream the answer into the pending message as it arrives
+      let streamed = '';
+      const data = await askQuestionStream(sessionId, pendingMessage.question, (text) => {
+        streamed += text;
+        setMessages(prevMessages =>
+          prevMessages.map(msg =>
+            msg.id === pendingMessage.id ? { ...msg, answer: streamed } : msg
+          )
+        );
+      });
       
-      // Update with actual response
+      // Update with the stored conversation
       setMessages(prevMessages => 
         prevMessages.map(msg => 
           msg.id === pendingMessage.id 
@@ -69,7 +77,7 @@ const QASection: React.FC<QASectionProps> = ({ sessionId, initialMessages = [] }
       
       // Remove pending message on error
       setMessages(prevMessages => 
-        prevMessages.filter(msg => msg.id !== Date.now())
+        prevMessages.filter(msg => msg.id !== pendingMessage.id)
       );
     } finally {
       setIsLoading(false);
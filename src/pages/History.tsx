@@ -2,9 +2,11 @@
 import React, { useEffect, useState } from 'react';
 import Navbar from '@/components/Navbar';
 import HistoryCard from '@/components/HistoryCard';
-import { getUserHistory } from '@/utils/api';
+import { getUserHistory, searchTranscripts } from '@/utils/api';
+import { Link } from 'react-router-dom';
 import { History as HistoryIcon, Search } from 'lucide-react';
 import { Input } from '@/components/ui/input';
+import { Button } from '@/components/ui/button';
 import { useAuth } from '@/contexts/AuthContext';
 
 interface Session {
@@ -21,11 +23,37 @@ interface Session {
   thumbnail?: string;
 }
 
+interface SearchResult {
+  session_id: string;
+  title: string;
+  timestamp: string;
+  start: number;
+  end: number;
+  snippet: string;
+}
+
+const formatSeconds = (seconds: number) => {
+  const total = Math.floor(seconds);
+  const h = Math.floor(total / 3600);
+  const m = Math.floor((total % 3600) / 60);
+  const s = total % 60;
+  return `${h > 0 ? `${h}:` : ''}${h > 0 ? String(m).padStart(2, '0') : m}:${String(s).padStart(2, '0')}`;
+};
+
+// Snippets mark matches with <mark>; render them as text so transcript content is never parsed as HTML
+const renderSnippet = (snippet: string) =>
+  snippet.split(/<\/?mark>/).map((part, i) =>
+    i % 2 === 1 ? <mark key={i} className="bg-yellow-100">{part}</mark> : <React.Fragment key={i}>{part}</React.Fragment>
+  );
+
 const History: React.FC = () => {
   const [sessions, setSessions] = useState<Session[]>([]);
   const [filteredSessions, setFilteredSessions] = useState<Session[]>([]);
   const [searchQuery, setSearchQuery] = useState('');
   const [isLoading, setIsLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  const [searchResults, setSearchResults] = useState<SearchResult[]>([]);
   const { isAuthenticated } = useAuth();
 
   useEffect(() => {
@@ -35,6 +63,7 @@ const History: React.FC = () => {
         const data = await getUserHistory();
         setSessions(data.sessions || []);
         setFilteredSessions(data.sessions || []);
+        setNextCursor(data.next_cursor || null);
       } catch (error) {
         console.error('Error fetching history:', error);
       } finally {
@@ -49,6 +78,21 @@ const History: React.FC = () => {
     }
   }, [isAuthenticated]);
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+
+    setIsLoadingMore(true);
+    try {
+      const data = await getUserHistory(nextCursor);
+      setSessions((prevSessions) => [...prevSessions, ...(data.sessions || [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (error) {
+      console.error('Error fetching history:', error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     if (searchQuery.trim() === '') {
       setFilteredSessions(sessions);
@@ -64,6 +108,25 @@ const History: React.FC = () => {
     }
   }, [searchQuery, sessions]);
 
+  useEffect(() => {
+    // Search inside transcripts once the user pauses typing
+    const query = searchQuery.trim();
+    if (!isAuthenticated || query.length < 2) {
+      setSearchResults([]);
+      return;
+    }
+
+    const timer = setTimeout(async () => {
+      try {
+        const data = await searchTranscripts(query);
+        setSearchResults(data.results || []);
+      } catch (error) {
+        console.error('Error searching transcripts:', error);
+      }
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [searchQuery, isAuthenticated]);
+
   const handleDeleteSession = (sessionId: string) => {
     setSessions((prevSessions) => prevSessions.filter((session) => session.id !== sessionId));
   };
@@ -105,17 +168,44 @@ const History: React.FC = () => {
             </div>
           ) : (
             <>
+              {isAuthenticated && searchResults.length > 0 && (
+                <div className="mb-8 bg-white rounded-lg shadow divide-y">
+                  <h2 className="px-4 py-3 text-sm font-medium text-gray-700">Matches in transcripts</h2>
+                  {searchResults.map((result) => (
+                    <Link
+                      key={`${result.session_id}-${result.start}`}
+                      to={`/results/${result.session_id}`}
+                      className="block px-4 py-3 hover:bg-gray-50"
+                    >
+                      <div className="flex justify-between text-sm">
+                        <span className="font-medium text-gray-900">{result.title}</span>
+                        <span className="text-gray-500">{formatSeconds(result.start)}</span>
+                      </div>
+                      <p className="mt-1 text-sm text-gray-600">{renderSnippet(result.snippet)}</p>
+                    </Link>
+                  ))}
+                </div>
+              )}
               {isAuthenticated ? (
                 filteredSessions.length > 0 ? (
-                  <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-                    {filteredSessions.map((session) => (
-                      <HistoryCard 
-                        key={session.id} 
-                        session={session} 
-                        onDelete={handleDeleteSession}
-                      />
-                    ))}
-                  </div>
+                  <>
+                    <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
+                      {filteredSessions.map((session) => (
+                        <HistoryCard 
+                          key={session.id} 
+                          session={session} 
+                          onDelete={handleDeleteSession}
+                        />
+                      ))}
+                    </div>
+                    {nextCursor && (
+                      <div className="mt-8 text-center">
+                        <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+                          {isLoadingMore ? 'Loading...' : 'Load more'}
+                        </Button>
+                      </div>
+                    )}
+                  </>
                 ) : (
                   <div className="text-center py-16 bg-white rounded-lg shadow">
                     <HistoryIcon className="mx-auto h-12 w-12 text-gray-400" />
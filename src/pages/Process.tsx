@@ -3,12 +3,30 @@ import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import Navbar from '@/components/Navbar';
 import VideoUploader from '@/components/VideoUploader';
-import { processVideo } from '@/utils/api';
+import { Progress } from '@/components/ui/progress';
+import { processVideo, subscribeToJob, uploadVideoResumable } from '@/utils/api';
 import { toast } from 'sonner';
 import { useAuth } from '@/contexts/AuthContext';
 
+const LIVE_TRANSCRIPT_LINES = 5;
+
+const STAGE_LABELS: Record<string, string> = {
+  queued: 'Waiting in queue',
+  starting: 'Starting',
+  waiting: 'Waiting for the same video to finish processing',
+  uploading: 'Uploading video',
+  downloading: 'Downloading video',
+  transcribing: 'Transcribing audio',
+  summarizing: 'Generating summary',
+  saving: 'Saving results',
+  done: 'Done',
+};
+
 const Process: React.FC = () => {
   const [isProcessing, setIsProcessing] = useState(false);
+  const [jobStatus, setJobStatus] = useState<{ stage: string; progress: number } | null>(null);
+  const [liveTranscript, setLiveTranscript] = useState<string[]>([]);
+  const [liveSummary, setLiveSummary] = useState('');
   const { isAuthenticated } = useAuth();
   const navigate = useNavigate();
   
@@ -22,19 +40,50 @@ const Process: React.FC = () => {
     setIsProcessing(true);
     
     try {
-      const data = await processVideo(formData);
-      
-      if (data.session_id) {
-        toast.success('Video processed successfully!');
-        navigate(`/results/${data.session_id}`);
+      // Files go up in resumable chunks; YouTube links are posted directly
+      const video = formData.get('video');
+      let data;
+      if (video instanceof File) {
+        setJobStatus({ stage: 'uploading', progress: 0 });
+        data = await uploadVideoResumable(video, (formData.get('title') as string) || video.name, (fraction) =>
+          setJobStatus({ stage: 'uploading', progress: Math.round(fraction * 100) })
+        );
       } else {
+        data = await processVideo(formData);
+      }
+      
+      if (!data.job_id) {
         toast.error('Failed to process video.');
+        return;
       }
+      
+      // Processing runs in the background; follow its progress over SSE
+      setJobStatus({ stage: 'queued', progress: 0 });
+      await new Promise<void>((resolve) => {
+        subscribeToJob(data.job_id, {
+          onStage: (stage, progress) => setJobStatus({ stage, progress }),
+          onSegment: (segment) =>
+            setLiveTranscript((lines) => [...lines, segment.text].slice(-LIVE_TRANSCRIPT_LINES)),
+          onSummary: (text) => setLiveSummary((summary) => summary + text),
+          onDone: (sessionId) => {
+            toast.success('Video processed successfully!');
+            navigate(`/results/${sessionId}`);
+            resolve();
+          },
+          onFailed: (error) => {
+            toast.error(error || 'Failed to process video.');
+            resolve();
+          },
+        });
+      });
     } catch (error) {
       console.error('Error processing video:', error);
       toast.error('An error occurred while processing the video.');
     } finally {
       setIsProcessing(false);
+      setJobStatus(null);
+      setLiveTranscript([]);
+      setLiveSummary('');
     }
   };
   
@@ -67,6 +116,31 @@ const Process: React.FC = () => {
           
           <VideoUploader onSubmit={handleSubmit} isProcessing={isProcessing} />
           
+          {jobStatus && (
+            <div className="mt-6 bg-white p-6 rounded-lg shadow-sm border">
+              <div className="flex justify-between text-sm text-gray-700 mb-2">
+                <span>{STAGE_LABELS[jobStatus.stage] || jobStatus.stage}</span>
+                <span>{jobStatus.progress}%</span>
+              </div>
+              <Progress value={jobStatus.progress} />
+              
+              {liveTranscript.length > 0 && (
+                <div className="mt-4 text-sm text-gray-600 space-y-1">
+                  {liveTranscript.map((line, index) => (
+                    <p key={index}>{line}</p>
+                  ))}
+                </div>
+              )}
+              
+              {liveSummary && (
+                <div className="mt-4">
+                  <h3 className="text-sm font-semibold text-gray-900 mb-1">Summary</h3>
+                  <p className="text-sm text-gray-700 whitespace-pre-line">{liveSummary}</p>
+                </div>
+              )}
+            </div>
+          )}
+          
           <div className="mt-8 bg-white p-6 rounded-lg shadow-sm border">
             <h2 className="text-lg font-semibold mb-3">How it works</h2>
             <ol className="list-decimal list-inside space-y-2 text-gray-700">
@@ -25,8 +25,8 @@ interface ResultsData {
     youtube_id?: string;
     video_path?: string;
     timestamp: string;
-    transcript: string;
-    summary: string;
+    transcript?: string;
+    summary?: string;
     duration?: number;
   };
   conversations: Conversation[];
@@ -37,6 +37,7 @@ const Results: React.FC = () => {
   const { sessionId } = useParams<{ sessionId: string }>();
   const [data, setData] = useState<ResultsData | null>(null);
   const [isLoading, setIsLoading] = useState(true);
+  const [isTranscriptLoading, setIsTranscriptLoading] = useState(false);
   const navigate = useNavigate();
   const { isAuthenticated } = useAuth();
 
@@ -63,6 +64,25 @@ const Results: React.FC = () => {
     }
   }, [sessionId, isAuthenticated]);
 
+  const handleTabChange = async (tab: string) => {
+    // The transcript is fetched the first time its tab is opened
+    if (tab !== 'transcript' || !sessionId || !data || data.session.transcript !== undefined) return;
+
+    setIsTranscriptLoading(true);
+    try {
+      const transcriptData = await getResults(sessionId, 'transcript');
+      setData((current) => current && {
+        ...current,
+        session: { ...current.session, transcript: transcriptData.session.transcript ?? '' },
+      });
+    } catch (error) {
+      console.error('Error fetching transcript:', error);
+      toast.error('Failed to load transcript');
+    } finally {
+      setIsTranscriptLoading(false);
+    }
+  };
+
   const handleDownloadTranscript = async () => {
     if (!sessionId) return;
 
@@ -78,7 +98,8 @@ const Results: React.FC = () => {
   const getVideoUrl = () => {
     if (!data) return '';
 
-    if (data.session.is_youtube && data.session.youtube_id) {
+    // YouTube sessions without a local copy play through the embed
+    if (data.session.is_youtube && data.session.youtube_id && !data.session.video_path) {
       return data.session.youtube_id;
     }
 
@@ -158,12 +179,12 @@ const Results: React.FC = () => {
                     src={getVideoUrl()}
                     thumbnail={getVideoThumbnail()}
                     title={data.session.title}
-                    isYoutube={data.session.is_youtube}
+                    isYoutube={data.session.is_youtube && !data.session.video_path}
                   />
                 </div>
                 
                 <div className="bg-white rounded-lg shadow-md border overflow-hidden">
-                  <Tabs defaultValue="summary">
+                  <Tabs defaultValue="summary" onValueChange={handleTabChange}>
                     <div className="px-4 pt-4 border-b">
                       <TabsList className="w-full justify-start">
                         <TabsTrigger value="summary" className="flex items-center gap-2">
@@ -197,14 +218,21 @@ const Results: React.FC = () => {
                         </Button>
                       </div>
                       <div className="prose max-w-none">
-                        <p className="text-sm text-gray-700 whitespace-pre-line font-mono">
-                          {data.session.transcript}
-                          {data.session.transcript.length > 500 && (
-                            <span className="block mt-2 text-gray-500">
-                              ... (Download for full transcript)
-                            </span>
-                          )}
-                        </p>
+                        {isTranscriptLoading ? (
+                          <div className="space-y-2">
+                            <div className="h-4 bg-gray-200 rounded animate-pulse"></div>
+                            <div className="h-4 bg-gray-200 rounded animate-pulse w-5/6"></div>
+                          </div>
+                        ) : (
+                          <p className="text-sm text-gray-700 whitespace-pre-line font-mono">
+                            {data.session.transcript}
+                            {(data.session.transcript?.length ?? 0) > 500 && (
+                              <span className="block mt-2 text-gray-500">
+                                ... (Download for full transcript)
+                              </span>
+                            )}
+                          </p>
+                        )}
                       </div>
                     </TabsContent>
                   </Tabs>
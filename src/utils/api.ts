@@ -1,7 +1,7 @@
 
 import { toast } from 'sonner';
 
-const API_URL = 'http://localhost:5000'; // Change this to your Flask backend URL
+export const API_URL = 'http://localhost:5000'; // Change this to your Flask backend URL
 
 interface ApiOptions {
   method?: string;
@@ -99,8 +99,128 @@ export const processVideo = async (formData: FormData) => {
   });
 };
 
-export const getResults = async (sessionId: string) => {
-  return api(`/results/${sessionId}`);
+const UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024;
+const UPLOAD_RETRIES = 5;
+const UPLOAD_BUSY_WAIT_SECONDS = 30;
+
+const fetchUploadOffset = async (uploadId: string) => {
+  const response = await fetch(`${API_URL}/upload/${uploadId}`, { credentials: 'include' });
+  if (!response.ok) return null;
+  const data = await response.json();
+  return data.status === 'open' ? (data.offset as number) : null;
+};
+
+// Resumable upload: create, PATCH chunks at the offset the server has, then finalize,
+// which queues processing like /process. A failed chunk resumes from the server's
+// offset, and an upload interrupted by a page reload picks up where it stopped
+export const uploadVideoResumable = async (file: File, title: string, onProgress?: (fraction: number) => void) => {
+  const storageKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+  let uploadId = localStorage.getItem(storageKey);
+  let offset = uploadId ? await fetchUploadOffset(uploadId) : null;
+
+  if (!uploadId || offset === null) {
+    const created = await api('/upload', {
+      method: 'POST',
+      body: { filename: file.name, size: file.size, title },
+    });
+    uploadId = created.upload_id as string;
+    offset = 0;
+    localStorage.setItem(storageKey, uploadId);
+  }
+
+  let failures = 0;
+  let expired = false;
+  while (offset < file.size) {
+    onProgress?.(offset / file.size);
+    try {
+      const response = await fetch(`${API_URL}/upload/${uploadId}`, {
+        method: 'PATCH',
+        credentials: 'include',
+        headers: {
+          'Content-Type': 'application/offset+octet-stream',
+          'Upload-Offset': String(offset),
+        },
+        body: file.slice(offset, offset + UPLOAD_CHUNK_BYTES),
+      });
+      const data = await response.json();
+      if (response.status === 410) {
+        // The upload expired on the server; the next attempt starts a fresh one
+        localStorage.removeItem(storageKey);
+        expired = true;
+        throw new Error(data.message || 'Upload expired');
+      }
+      // A busy upload is still being written by an earlier request; wait for its lock
+      if (response.status === 409 && typeof data.retry_after === 'number') {
+        await new Promise((resolve) => setTimeout(resolve, 1000 * Math.min(data.retry_after, UPLOAD_BUSY_WAIT_SECONDS)));
+        offset = (await fetchUploadOffset(uploadId)) ?? offset;
+        continue;
+      }
+      // Any other 409 means the server is at another offset; continue from there
+      if (!response.ok && response.status !== 409) {
+        throw new Error(data.message || 'Upload failed');
+      }
+      if (typeof data.offset !== 'number') {
+        throw new Error(data.message || 'Upload failed');
+      }
+      offset = data.offset;
+      failures = 0;
+    } catch (error) {
+      if (expired) throw error;
+      failures += 1;
+      if (failures > UPLOAD_RETRIES) throw error;
+      await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** failures));
+      offset = (await fetchUploadOffset(uploadId)) ?? offset;
+    }
+  }
+  onProgress?.(1);
+
+  const data = await api(`/upload/${uploadId}/finalize`, { method: 'POST' });
+  localStorage.removeItem(storageKey);
+  return data;
+};
+
+export const getJob = async (jobId: string) => {
+  return api(`/jobs/${jobId}`);
+};
+
+export interface JobEventHandlers {
+  onStage?: (stage: string, progress: number) => void;
+  onSegment?: (segment: { start: number; end: number; text: string }) => void;
+  onSummary?: (text: string) => void;
+  onDone: (sessionId: string) => void;
+  onFailed: (error: string) => void;
+}
+
+// Server-Sent Events for a processing job: stage changes, transcript segments as
+// they are decoded and the summary as it is generated
+export const subscribeToJob = (jobId: string, handlers: JobEventHandlers) => {
+  const source = new EventSource(`${API_URL}/jobs/${jobId}/events`, { withCredentials: true });
+
+  source.addEventListener('stage', (e) => {
+    const data = JSON.parse((e as MessageEvent).data);
+    handlers.onStage?.(data.stage, data.progress);
+  });
+  source.addEventListener('segment', (e) => {
+    handlers.onSegment?.(JSON.parse((e as MessageEvent).data));
+  });
+  source.addEventListener('summary', (e) => {
+    handlers.onSummary?.(JSON.parse((e as MessageEvent).data).text);
+  });
+  source.addEventListener('done', (e) => {
+    source.close();
+    handlers.onDone(JSON.parse((e as MessageEvent).data).session_id);
+  });
+  source.addEventListener('failed', (e) => {
+    source.close();
+    handlers.onFailed(JSON.parse((e as MessageEvent).data).error);
+  });
+
+  return source;
+};
+
+// The transcript is only sent when asked for, e.g. include = 'transcript'
+export const getResults = async (sessionId: string, include = 'summary') => {
+  return api(`/results/${sessionId}?include=${include}`);
 };
 
 export const askQuestion = async (sessionId: string, question: string) => {
@@ -110,12 +230,77 @@ export const askQuestion = async (sessionId: string, question: string) => {
   });
 };
 
-export const downloadTranscript = async (sessionId: string) => {
-  return api(`/download_transcript/${sessionId}`);
+// Streams the answer over SSE (POST, so EventSource can't be used) and calls
+// onText with each chunk; resolves with the full answer once it is stored
+export const askQuestionStream = async (
+  sessionId: string,
+  question: string,
+  onText: (text: string) => void
+) => {
+  const response = await fetch(`${API_URL}/ask/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    credentials: 'include',
+    body: JSON.stringify({ session_id: sessionId, question }),
+  });
+
+  if (!response.ok || !response.body) {
+    const data = await response.json().catch(() => ({}));
+    throw new Error(data.message || 'Something went wrong');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let answer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      const event = frame.match(/^event: (.*)$/m)?.[1];
+      const data = frame.match(/^data: (.*)$/m)?.[1];
+      if (!event || !data) continue;
+
+      const payload = JSON.parse(data);
+      if (event === 'answer') {
+        answer += payload.text;
+        onText(payload.text);
+      } else if (event === 'done') {
+        return { answer, conversation_id: payload.conversation_id };
+      } else if (event === 'failed') {
+        throw new Error(payload.error);
+      }
+    }
+  }
+
+  throw new Error('Answer stream ended unexpectedly');
+};
+
+// format: 'txt' (default), 'srt', 'vtt' or 'json'
+export const downloadTranscript = async (sessionId: string, format = 'txt') => {
+  return api(`/download_transcript/${sessionId}?format=${format}`);
+};
+
+// Paginated newest first; pass the previous page's next_cursor to continue
+export const getUserHistory = async (cursor?: string) => {
+  return api(cursor ? `/history?cursor=${encodeURIComponent(cursor)}` : '/history');
+};
+
+// Transcript segments matching the query across all of the user's sessions
+export const searchTranscripts = async (query: string) => {
+  return api(`/search?q=${encodeURIComponent(query)}`);
 };
 
-export const getUserHistory = async () => {
-  return api('/history');
+export const getContactMessages = async (cursor?: string) => {
+  return api(cursor ? `/contact?cursor=${encodeURIComponent(cursor)}` : '/contact');
 };
 
 export const getUserDashboard = async () => {
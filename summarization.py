@@ -0,0 +1,92 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Transcripts longer than this are summarized chunk by chunk and then reduced
+SUMMARY_CHUNK_CHARS = 12000
+SUMMARY_CONCURRENCY = 4
+
+STYLES = {
+    'concise': "You are a helpful assistant that provides concise and informative summaries of video content.",
+    'detailed': "You are a helpful assistant that provides detailed summaries of video content, covering every key point, example and conclusion.",
+    'bullets': "You are a helpful assistant that summarizes video content as a short list of bullet points.",
+}
+DEFAULT_STYLE = 'concise'
+
+DIRECT_PROMPT = "{style} Please provide a summary of the following transcript:\n\n{text}"
+MAP_PROMPT = ("Summarize this part of a video transcript. Keep the key points, names, numbers and "
+              "the timestamps where topics change.\n\n{text}")
+REDUCE_PROMPT = ("{style} The following are summaries of consecutive parts of one video, in order. "
+                 "Please combine them into a single summary of the whole video:\n\n{text}")
+COMBINE_PROMPT = ("The following are summaries of consecutive parts of one video, in order. "
+                  "Merge them into one summary that keeps the key points:\n\n{text}")
+
+
+def split_text(text, max_chars=SUMMARY_CHUNK_CHARS):
+    # Split on line boundaries so transcript segments stay whole
+    chunks = []
+    current = []
+    size = 0
+    for line in text.splitlines():
+        if current and size + len(line) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def group_parts(parts, max_chars=SUMMARY_CHUNK_CHARS, separator="\n\n"):
+    # Like split_text, but over whole parts: a multi-line partial summary is never cut in two
+    groups = []
+    current = []
+    size = 0
+    for part in parts:
+        if current and size + len(separator) + len(part) > max_chars:
+            groups.append(separator.join(current))
+            current, size = [], 0
+        size += (len(separator) if current else 0) + len(part)
+        current.append(part)
+    if current:
+        groups.append(separator.join(current))
+    return groups
+
+
+def _chunk_key(text):
+    return f"chunk_summary_{hashlib.sha256(text.encode()).hexdigest()}"
+
+
+def _map(chunks, generate, chunk_cache, concurrency, prompt=MAP_PROMPT):
+    # Chunk summaries don't depend on the style, so they are cached and reused
+    # when the same transcript is summarized again in another style
+    def summarize_chunk(chunk):
+        chunk_prompt = prompt.format(text=chunk)
+        key = _chunk_key(chunk_prompt)
+        if chunk_cache is not None and key in chunk_cache:
+            return chunk_cache[key]
+        summary = generate(chunk_prompt)
+        if chunk_cache is not None:
+            chunk_cache[key] = summary
+        return summary
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(chunks)))) as pool:
+        return list(pool.map(summarize_chunk, chunks))
+
+
+def summarize(text, generate, style=DEFAULT_STYLE, chunk_cache=None, max_chars=SUMMARY_CHUNK_CHARS,
+              concurrency=SUMMARY_CONCURRENCY, on_text=None):
+    # generate(prompt, on_text=None) returns the model's text; on_text, when given,
+    # receives the final summary as it is produced
+    style_prompt = STYLES.get(style, STYLES[DEFAULT_STYLE])
+    if len(text) <= max_chars:
+        return generate(DIRECT_PROMPT.format(style=style_prompt, text=text), on_text=on_text)
+
+    partials = _map(split_text(text, max_chars), generate, chunk_cache, concurrency)
+    # Keep reducing until the partial summaries fit in one prompt
+    while len("\n\n".join(partials)) > max_chars and len(partials) > 1:
+        groups = group_parts(partials, max_chars)
+        if len(groups) >= len(partials):
+            break
+        partials = _map(groups, generate, chunk_cache, concurrency, COMBINE_PROMPT)
+    return generate(REDUCE_PROMPT.format(style=style_prompt, text="\n\n".join(partials)), on_text=on_text)
@@ -4,21 +4,24 @@ import os
 import uuid
 import hashlib
 import json
+import threading
 from datetime import timedelta
-from flask import Flask, request, jsonify, session, send_file, send_from_directory
+from flask import Flask, request, jsonify, session, send_file
 from flask_cors import CORS
+from media_serving import serve_media
 from werkzeug.utils import secure_filename
 import yt_dlp
-import google.generativeai as genai
-import ffmpeg
-import faster_whisper
+from transcription import select_backend, default_processes, transcribe_file, preload_transcriber
+from llm import create_client
 import re
-import io
 import aiohttp
 import aiofiles
 from cachetools import TTLCache
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, event
 from concurrent.futures import ThreadPoolExecutor
+from migrations import configure_connection, migrate
+import blob_store
+from segments import SegmentTable
 import warnings
 warnings.filterwarnings("ignore", message="pkg_resources is deprecated as an API")
 
@@ -26,11 +29,8 @@ warnings.filterwarnings("ignore", message="pkg_resources is deprecated as an API
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Configure Gemini API key
-genai.configure(api_key=os.environ.get('GOOGLE_API_KEY'))
-
-# Initialize Gemini 1.5 Flash model
-model = genai.GenerativeModel("gemini-1.5-flash")
+# Shared LLM client (Gemini 1.5 Flash by default); bounds concurrency and retries transient errors
+llm = create_client()
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -45,12 +45,27 @@ ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
 # Create database engine with connection pooling
 engine = create_engine(f'sqlite:///{DATABASE}', pool_size=5, max_overflow=10)
 
+@event.listens_for(engine, "connect")
+def on_connect(dbapi_connection, connection_record):
+    # WAL, synchronous=NORMAL and mmap for every pooled connection
+    configure_connection(dbapi_connection)
+
 # Cache for transcripts and summaries (TTL: 1 hour)
 cache = TTLCache(maxsize=100, ttl=3600)
 
 # Thread pool for CPU-bound tasks
 executor = ThreadPoolExecutor(max_workers=4)
 
+# Whisper model settings; the model itself is loaded once and shared via the registry
+WHISPER_MODEL_SIZE = os.environ.get('WHISPER_MODEL_SIZE', 'small')
+WHISPER_PRELOAD = os.environ.get('WHISPER_PRELOAD', '1') == '1'
+
+# Device, compute type and threading are picked from the hardware in startup() unless overridden
+TRANSCRIPTION_BACKEND = None
+
+# Worker processes for chunked transcription of long videos (1 = transcribe in-process)
+TRANSCRIBE_PROCESSES = 1
+
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
@@ -79,6 +94,7 @@ def init_db():
             youtube_id VARCHAR(50),
             transcript TEXT,
             summary TEXT,
+            transcription_backend TEXT,
             FOREIGN KEY (user_id) REFERENCES user(id)
         )
         '''))
@@ -105,6 +121,8 @@ def init_db():
         )
         '''))
         
+        blob_store.create_table(conn)
+        
         # Create admin user if not exists
         result = conn.execute(text("SELECT * FROM user WHERE email = 'admin@example.com'")).mappings().fetchone()
         if not result:
@@ -113,9 +131,27 @@ def init_db():
                         {'username': 'Admin', 'email': 'admin@example.com', 'password': hashed_password, 'is_admin': 1})
         
         conn.commit()
-    logger.debug("Database initialized successfully")
-
-init_db()
+    
+    # Versioned schema changes (indexes, denormalized counts) on top of the base tables
+    raw = engine.raw_connection()
+    try:
+        version = migrate(raw)
+    finally:
+        raw.close()
+    logger.debug(f"Database initialized successfully (schema version {version})")
+
+# Sessions stored here keep their transcript and summary inline; app.py moves them (and
+# stores its own sessions) into the blob store, with the transcript as a segment table
+def load_transcript(conn, session_id, inline):
+    if inline is not None:
+        return inline
+    data = blob_store.get_text(conn, session_id, blob_store.SEGMENTS)
+    if data is not None:
+        return SegmentTable.loads(data).render()
+    return blob_store.get_text(conn, session_id, blob_store.TRANSCRIPT)
+
+def load_summary(conn, session_id, inline):
+    return inline if inline is not None else blob_store.get_text(conn, session_id, blob_store.SUMMARY)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -188,22 +224,11 @@ def transcribe_video(file_path):
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Video file not found: {file_path}")
 
-        # Extract audio using FFmpeg with GPU acceleration
-        output_audio = io.BytesIO()
-        stream = ffmpeg.input(file_path).output('pipe:', format='wav', acodec='pcm_s16le', ar=16000, loglevel='quiet')
-        audio_data, _ = ffmpeg.run(stream, capture_stdout=True)
-        output_audio.write(audio_data)
-        output_audio.seek(0)
-        logger.debug("Audio extracted successfully")
-
-        # Load faster-whisper model with CUDA
-        whisper_model = faster_whisper.WhisperModel(model_size_or_path="small", device="cuda", compute_type="float16")
-        logger.debug("Whisper model loaded")
-
-        # Transcribe audio
-        segments, _ = whisper_model.transcribe(output_audio, language='en')
+        # Stream audio out of FFmpeg in silence-aligned chunks, transcribed in
+        # parallel by the worker processes and stitched back in order
+        segments = transcribe_file(file_path, WHISPER_MODEL_SIZE, TRANSCRIPTION_BACKEND, TRANSCRIBE_PROCESSES, language='en')
         transcript = "\n".join(
-            f"[{str(timedelta(seconds=int(segment.start)))} - {str(timedelta(seconds=int(segment.end)))}] {segment.text.strip()}"
+            f"[{str(timedelta(seconds=int(segment['start'])))} - {str(timedelta(seconds=int(segment['end'])))}] {segment['text'].strip()}"
             for segment in segments
         )
         logger.debug("Transcription completed successfully")
@@ -224,8 +249,7 @@ def summarize_text(transcript):
     
     try:
         prompt = f"You are a helpful and detail-oriented assistant that provides comprehensive, informative summaries of video content.Please read the following transcript and generate a detailed summary of the video in 100 to 200 words. The summary should fully capture the key points, ideas, and arguments so that a reader can understand the complete essence of the content without needing to watch the video. Ensure the summary flows naturally, includes relevant context, and highlights any important conclusions, examples, or recommendations made in the video.\n\n{transcript}"
-        response = model.generate_content(prompt, generation_config={"max_output_tokens": 500})
-        summary = response.text
+        summary = llm.generate(prompt, max_output_tokens=500)
         cache[cache_key] = summary
         logger.debug("Summarization completed successfully")
         return summary
@@ -243,9 +267,9 @@ def answer_question(transcript, question):
 
                 If the information needed to answer the question is not found in the transcript, search reliable internet sources to find and provide an accurate, up-to-date answer. Always ensure the user receives a complete response, whether from the transcript or external sources."""
 
-        response = model.generate_content(prompt, generation_config={"max_output_tokens": 500})
+        answer = llm.generate(prompt, max_output_tokens=500)
         logger.debug("Question answered successfully")
-        return response.text
+        return answer
     except Exception as e:
         logger.error(f"Question answering error: {e}")
         return "Error in processing your question."
@@ -262,7 +286,8 @@ def index():
 @app.route('/uploads/<filename>')
 def serve_uploaded_file(filename):
     logger.debug(f"Serving file: {filename}")
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    # Byte ranges, validators and caching headers so video seeking never re-downloads the file
+    return serve_media(UPLOAD_FOLDER, filename)
 
 @app.route('/login', methods=['GET', 'POST'])
 async def login():
@@ -427,8 +452,8 @@ async def process_video():
         logger.debug("Inserting session data into database")
         with engine.connect() as conn:
             conn.execute(text('''
-            INSERT INTO session (id, user_id, title, is_youtube, video_path, youtube_id, transcript, summary)
-            VALUES (:id, :user_id, :title, :is_youtube, :video_path, :youtube_id, :transcript, :summary)
+            INSERT INTO session (id, user_id, title, is_youtube, video_path, youtube_id, transcript, summary, transcription_backend)
+            VALUES (:id, :user_id, :title, :is_youtube, :video_path, :youtube_id, :transcript, :summary, :transcription_backend)
             '''), {
                 'id': session_id,
                 'user_id': user_id,
@@ -437,7 +462,8 @@ async def process_video():
                 'video_path': video_path,
                 'youtube_id': youtube_id,
                 'transcript': transcript,
-                'summary': summary
+                'summary': summary,
+                'transcription_backend': json.dumps({'model': WHISPER_MODEL_SIZE, **TRANSCRIPTION_BACKEND})
             })
             conn.commit()
             logger.debug("Session data inserted successfully into database")
@@ -473,6 +499,8 @@ def get_results(session_id):
                                    {'id': session_id}).mappings().fetchall()
         
         session_dict = dict(session_data)
+        session_dict['transcript'] = load_transcript(conn, session_id, session_dict['transcript'])
+        session_dict['summary'] = load_summary(conn, session_id, session_dict['summary'])
         conversation_list = [dict(conv) for conv in conversations]
         
         video_url = None
@@ -514,7 +542,7 @@ async def ask_question():
             logger.debug("Unauthorized access")
             return jsonify({"message": "Unauthorized"}), 403
         
-        transcript = session_data['transcript']
+        transcript = load_transcript(conn, session_id, session_data['transcript'])
         
         answer = await asyncio.get_event_loop().run_in_executor(executor, answer_question, transcript, question)
         
@@ -554,7 +582,7 @@ async def download_transcript(session_id):
             logger.debug("Unauthorized access")
             return jsonify({"message": "Unauthorized"}), 403
         
-        transcript = session_data['transcript']
+        transcript = load_transcript(conn, session_id, session_data['transcript'])
         title = session_data['title']
         
         safe_title = re.sub(r'[^a-zA-Z0-9]', '_', title)
@@ -590,13 +618,10 @@ def get_history():
     
     with engine.connect() as conn:
         sessions = conn.execute(text("""
-        SELECT s.id, s.title, s.timestamp, s.is_youtube, s.youtube_id, s.video_path, 
-               COUNT(c.id) as conversation_count
-        FROM session s
-        LEFT JOIN conversation c ON s.id = c.session_id
-        WHERE s.user_id = :user_id
-        GROUP BY s.id
-        ORDER BY s.timestamp DESC
+        SELECT id, title, timestamp, is_youtube, youtube_id, video_path, conversation_count
+        FROM session
+        WHERE user_id = :user_id
+        ORDER BY timestamp DESC
         """), {'user_id': user_id}).mappings().fetchall()
         
         sessions_list = [dict(session) for session in sessions]
@@ -629,6 +654,7 @@ async def delete_session(session_id):
                                 {'id': session_id}).mappings().fetchone()
         
         conn.execute(text("DELETE FROM conversation WHERE session_id = :id"), {'id': session_id})
+        blob_store.delete_texts(conn, session_id)
         conn.execute(text("DELETE FROM session WHERE id = :id"), {'id': session_id})
         conn.commit()
         
@@ -826,6 +852,45 @@ def admin_stats():
             "total_questions": total_questions
         })
 
+startup_lock = threading.Lock()
+started = False
+
+def startup():
+    # Kept out of import: spawned transcription workers re-import this script (as __mp_main__).
+    # Runs once per process, whichever entry point gets here first
+    global started
+    with startup_lock:
+        if started:
+            return
+        start_services()
+        started = True
+
+def start_services():
+    global TRANSCRIPTION_BACKEND, TRANSCRIBE_PROCESSES
+    TRANSCRIPTION_BACKEND = select_backend(
+        WHISPER_MODEL_SIZE,
+        device=os.environ.get('WHISPER_DEVICE', 'auto'),
+        compute_type=os.environ.get('WHISPER_COMPUTE_TYPE', 'auto'),
+        cpu_threads=int(os.environ.get('WHISPER_CPU_THREADS', 0)),
+        num_workers=int(os.environ.get('WHISPER_NUM_WORKERS', 0)),
+        benchmark=os.environ.get('WHISPER_BENCHMARK', '0') == '1'
+    )
+    TRANSCRIBE_PROCESSES = int(os.environ.get('TRANSCRIBE_PROCESSES', 0)) or default_processes(TRANSCRIPTION_BACKEND)
+    
+    init_db()
+    
+    # Load the whisper model(s) in the background so the first request doesn't pay for it
+    if WHISPER_PRELOAD:
+        executor.submit(preload_transcriber, WHISPER_MODEL_SIZE, TRANSCRIPTION_BACKEND, TRANSCRIBE_PROCESSES)
+
+# WSGI servers and `flask run` start it on the first request
+@app.before_request
+def ensure_started():
+    startup()
+
 if __name__ == '__main__':
     logger.debug("Starting Flask application")
+    # Only the reloader's serving child starts up, not the parent that watches files
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        startup()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,107 @@
+import threading
+import time
+import unittest
+
+from summarization import summarize, split_text, group_parts, MAP_PROMPT, REDUCE_PROMPT, COMBINE_PROMPT, DIRECT_PROMPT, STYLES
+
+
+class FakeGenerate:
+    # Stands in for llm.generate: records prompts and how many calls overlap
+    def __init__(self, delay=0.02, overlap=None):
+        self.delay = delay
+        # The first `overlap` calls wait for each other, so they are known to run together
+        self.barrier = threading.Barrier(overlap) if overlap else None
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt, on_text=None):
+        with self.lock:
+            self.prompts.append(prompt)
+            call = len(self.prompts)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.barrier and call <= self.barrier.parties:
+                self.barrier.wait(timeout=5)
+            time.sleep(self.delay)
+            result = f"summary {call}"
+            if on_text:
+                on_text(result)
+            return result
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def map_calls(self):
+        return [p for p in self.prompts if p.startswith(MAP_PROMPT.split('{')[0])]
+
+
+def transcript(lines=40, width=50):
+    return "\n".join(f"[0:00:{i:02d} - 0:00:{i + 1:02d}] " + "word " * (width // 5) for i in range(lines))
+
+
+class SummarizeTest(unittest.TestCase):
+    def test_short_text_is_summarized_directly(self):
+        generate = FakeGenerate(delay=0)
+        streamed = []
+        result = summarize("short transcript", generate, 'bullets', on_text=streamed.append)
+        self.assertEqual(generate.prompts, [DIRECT_PROMPT.format(style=STYLES['bullets'], text="short transcript")])
+        self.assertEqual(streamed, [result])
+
+    def test_long_text_is_chunked_on_line_boundaries(self):
+        text = transcript()
+        chunks = split_text(text, 500)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= 500 for chunk in chunks))
+        self.assertEqual("\n".join(chunks), text)
+
+        generate = FakeGenerate(delay=0)
+        summarize(text, generate, max_chars=500)
+        self.assertEqual(sorted(generate.map_calls()), sorted(MAP_PROMPT.format(text=chunk) for chunk in chunks))
+        self.assertTrue(generate.prompts[-1].startswith(REDUCE_PROMPT.split('{text}')[0].format(style=STYLES['concise'])))
+
+    def test_chunk_calls_are_bounded_by_concurrency(self):
+        generate = FakeGenerate(overlap=2)
+        summarize(transcript(), generate, max_chars=500, concurrency=2)
+        self.assertGreater(len(generate.map_calls()), 2)
+        self.assertEqual(generate.max_active, 2)
+
+    def test_partial_summaries_are_regrouped_whole(self):
+        parts = ["- point a\n- point b", "- point c\n- point d", "- point e\n- point f"]
+        groups = group_parts(parts, 45)
+        self.assertEqual(groups, ["\n\n".join(parts[:2]), parts[2]])
+
+        # Multi-line partials that together overflow the prompt are combined, never split
+        partial = "\n".join(["- " + "point " * 10] * 3)
+        calls = []
+
+        def generate(prompt, on_text=None):
+            calls.append(prompt)
+            return partial if prompt.startswith(MAP_PROMPT.split('{')[0]) else "combined"
+
+        summarize(transcript(), generate, max_chars=500)
+        combines = [p for p in calls if p.startswith(COMBINE_PROMPT.split('{')[0])]
+        self.assertTrue(combines)
+        for prompt in combines:
+            body = prompt[len(COMBINE_PROMPT.split('{')[0]):]
+            self.assertTrue(all(piece == partial for piece in body.split("\n\n")))
+
+    def test_style_change_reuses_chunk_summaries(self):
+        text = transcript()
+        cache = {}
+        first = FakeGenerate(delay=0)
+        summarize(text, first, 'concise', chunk_cache=cache, max_chars=500)
+        self.assertEqual(len(cache), len(first.map_calls()))
+
+        second = FakeGenerate(delay=0)
+        summarize(text, second, 'detailed', chunk_cache=cache, max_chars=500)
+        # Only the style-dependent reduce step runs again
+        self.assertEqual(second.map_calls(), [])
+        self.assertEqual(len(second.prompts), 1)
+        self.assertTrue(second.prompts[0].startswith(STYLES['detailed']))
+
+
+if __name__ == '__main__':
+    unittest.main()
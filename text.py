@@ -1,6 +1,7 @@
 import torch
 import whisper
 import sys
+from transcription import select_backend
 
 def check_gpu_usage():
     # Check if CUDA is available
@@ -36,6 +37,11 @@ def check_gpu_usage():
         print(f"Error loading Whisper model: {e}")
         sys.exit(1)
 
+    # Backend the Flask app would pick for faster-whisper on this machine
+    backend = select_backend("base")
+    print(f"Transcription Backend: {backend['device']}/{backend['compute_type']} "
+          f"(cpu_threads={backend['cpu_threads']}, num_workers={backend['num_workers']})")
+
 if __name__ == "__main__":
     print("Checking GPU usage for Whisper model...")
     check_gpu_usage()
\ No newline at end of file
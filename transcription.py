@@ -0,0 +1,439 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Whisper backends supported by the registry
+FASTER_WHISPER = 'faster-whisper'
+OPENAI_WHISPER = 'openai-whisper'
+
+# Models unused for this many seconds are dropped from memory
+MODEL_IDLE_TTL = int(os.environ.get('WHISPER_MODEL_IDLE_TTL', 1800))
+MODEL_SWEEP_INTERVAL = 60
+
+
+class _ModelEntry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.model = None
+        self.users = 0
+        self.last_used = time.monotonic()
+
+
+# Process-wide registry: one loaded model per backend/size/device/compute type/thread settings
+_models = {}
+_models_lock = threading.Lock()
+_sweeper = None
+
+
+def _load_model(backend, size, device, compute_type, cpu_threads=0, num_workers=1):
+    if backend == FASTER_WHISPER:
+        import faster_whisper
+        return faster_whisper.WhisperModel(model_size_or_path=size, device=device, compute_type=compute_type,
+                                           cpu_threads=cpu_threads, num_workers=num_workers)
+    if backend == OPENAI_WHISPER:
+        import whisper
+        return whisper.load_model(size, device=device)
+    raise ValueError(f"Unknown whisper backend: {backend}")
+
+
+def _start_sweeper():
+    global _sweeper
+    if _sweeper is None or not _sweeper.is_alive():
+        _sweeper = threading.Thread(target=_sweep_loop, name='whisper-model-sweeper', daemon=True)
+        _sweeper.start()
+
+
+def _sweep_loop():
+    while True:
+        time.sleep(MODEL_SWEEP_INTERVAL)
+        evict_idle_models()
+
+
+def evict_idle_models(max_idle=None):
+    max_idle = MODEL_IDLE_TTL if max_idle is None else max_idle
+    now = time.monotonic()
+    evicted = []
+    with _models_lock:
+        for key, entry in list(_models.items()):
+            if entry.users == 0 and entry.model is not None and now - entry.last_used > max_idle:
+                del _models[key]
+                evicted.append(key)
+    for key in evicted:
+        print(f"Evicted idle whisper model: {key}")
+    return evicted
+
+
+def get_model(size='base', device='cpu', compute_type='int8', backend=FASTER_WHISPER, cpu_threads=0, num_workers=1):
+    key = (backend, size, device, compute_type, cpu_threads, num_workers)
+    with _models_lock:
+        entry = _models.get(key)
+        if entry is None:
+            entry = _models[key] = _ModelEntry()
+    # Load outside the registry lock so other models stay available; the
+    # per-entry lock makes concurrent callers wait for a single load
+    with entry.lock:
+        if entry.model is None:
+            try:
+                entry.model = _load_model(backend, size, device, compute_type, cpu_threads, num_workers)
+            except Exception:
+                with _models_lock:
+                    if _models.get(key) is entry:
+                        del _models[key]
+                raise
+            _start_sweeper()
+    entry.last_used = time.monotonic()
+    return entry, key
+
+
+@contextmanager
+def use_model(size='base', device='cpu', compute_type='int8', backend=FASTER_WHISPER, cpu_threads=0, num_workers=1):
+    # Holds a reference for the duration of the block so the sweeper never drops
+    # a model that is still decoding (faster-whisper segments are lazy)
+    entry, key = get_model(size, device, compute_type, backend, cpu_threads, num_workers)
+    with _models_lock:
+        entry.users += 1
+        if _models.get(key) is not entry:
+            _models[key] = entry
+    try:
+        yield entry.model
+    finally:
+        with _models_lock:
+            entry.users -= 1
+            entry.last_used = time.monotonic()
+
+
+def preload_model(size='base', device='cpu', compute_type='int8', backend=FASTER_WHISPER, cpu_threads=0, num_workers=1):
+    try:
+        get_model(size, device, compute_type, backend, cpu_threads, num_workers)
+        print(f"Preloaded whisper model: {(backend, size, device, compute_type, cpu_threads, num_workers)}")
+        return True
+    except Exception as e:
+        print(f"Whisper model preload failed: {e}")
+        return False
+
+
+def loaded_models():
+    with _models_lock:
+        return [key for key, entry in _models.items() if entry.model is not None]
+
+
+# Compute types in order of preference for each device
+COMPUTE_TYPE_PREFERENCE = {
+    'cuda': ['float16', 'int8_float16', 'int8', 'float32'],
+    'cpu': ['int8', 'int8_float32', 'float32'],
+}
+BENCHMARK_SECONDS = 5
+
+
+def probe_hardware():
+    # ctranslate2 ships with faster-whisper and answers both questions without torch
+    try:
+        import ctranslate2
+    except ImportError:
+        return {'cuda_devices': 0, 'compute_types': {'cpu': {'float32'}}, 'cpu_count': os.cpu_count() or 1}
+    cuda_devices = ctranslate2.get_cuda_device_count()
+    compute_types = {'cpu': set(ctranslate2.get_supported_compute_types('cpu'))}
+    if cuda_devices:
+        compute_types['cuda'] = set(ctranslate2.get_supported_compute_types('cuda'))
+    return {'cuda_devices': cuda_devices, 'compute_types': compute_types, 'cpu_count': os.cpu_count() or 1}
+
+
+def _candidate_compute_types(device, supported):
+    return [c for c in COMPUTE_TYPE_PREFERENCE[device] if c in supported] or ['float32']
+
+
+def _benchmark(size, device, compute_types, cpu_threads, num_workers):
+    import numpy as np
+    audio = (np.random.default_rng(0).standard_normal(16000 * BENCHMARK_SECONDS) * 0.01).astype(np.float32)
+    timings = {}
+    for compute_type in compute_types:
+        try:
+            model = _load_model(FASTER_WHISPER, size, device, compute_type, cpu_threads, num_workers)
+            started = time.perf_counter()
+            segments, _ = model.transcribe(audio, language='en', beam_size=1)
+            list(segments)
+            timings[compute_type] = time.perf_counter() - started
+            del model
+        except Exception as e:
+            print(f"Benchmark of {device}/{compute_type} failed: {e}")
+    return timings
+
+
+def select_backend(size='base', device='auto', compute_type='auto', cpu_threads=0, num_workers=0, benchmark=False):
+    hardware = probe_hardware()
+
+    if device == 'auto':
+        device = 'cuda' if hardware['cuda_devices'] else 'cpu'
+    supported = hardware['compute_types'].get(device, set())
+    candidates = _candidate_compute_types(device, supported)
+
+    # Split the cores between the parallel decoders instead of oversubscribing
+    if not num_workers:
+        num_workers = 1 if device == 'cuda' else max(1, min(4, hardware['cpu_count'] // 4))
+    if not cpu_threads:
+        cpu_threads = max(1, hardware['cpu_count'] // num_workers)
+
+    if compute_type == 'auto':
+        compute_type = candidates[0]
+        if benchmark and len(candidates) > 1:
+            timings = _benchmark(size, device, candidates, cpu_threads, num_workers)
+            if timings:
+                compute_type = min(timings, key=timings.get)
+                print(f"Whisper benchmark ({device}): {timings}")
+
+    return {
+        'backend': FASTER_WHISPER,
+        'device': device,
+        'compute_type': compute_type,
+        'cpu_threads': cpu_threads,
+        'num_workers': num_workers,
+    }
+
+
+# Streaming audio extraction: ffmpeg decodes to 16 kHz mono PCM on stdout and the
+# recognizer is fed fixed-size windows, so memory stays flat for any video length
+SAMPLE_RATE = 16000
+READ_FRAME_SECONDS = 0.5
+WINDOW_SECONDS = int(os.environ.get('AUDIO_WINDOW_SECONDS', 300))
+CUT_SEARCH_SECONDS = 3
+CUT_FRAME_SECONDS = 0.05
+
+
+def quietest_point(audio, search_from, frame=int(SAMPLE_RATE * CUT_FRAME_SECONDS)):
+    import numpy as np
+    region = audio[search_from:]
+    frames = len(region) // frame
+    if frames < 2:
+        return len(audio)
+    energy = np.square(region[:frames * frame].reshape(frames, frame)).mean(axis=1)
+    return search_from + int(np.argmin(energy)) * frame + frame // 2
+
+
+class AudioWindowBuffer:
+    # Preallocated buffer holding at most one window of samples. A window is handed
+    # out as a view; the tail after the cut is moved to the front on the next write,
+    # so the caller must be done with a window before feeding more audio.
+    def __init__(self, window_seconds=WINDOW_SECONDS, sample_rate=SAMPLE_RATE):
+        import numpy as np
+        self.sample_rate = sample_rate
+        self.capacity = int(window_seconds * sample_rate)
+        self.samples = np.empty(self.capacity, dtype=np.float32)
+        self.size = 0
+        self.offset = 0  # absolute sample index of samples[0]
+        self.pending_cut = 0
+
+    def _compact(self):
+        if self.pending_cut:
+            cut = self.pending_cut
+            remainder = self.size - cut
+            self.samples[:remainder] = self.samples[cut:self.size]
+            self.size = remainder
+            self.offset += cut
+            self.pending_cut = 0
+
+    def free(self):
+        self._compact()
+        return self.capacity - self.size
+
+    def write(self, pcm):
+        import numpy as np
+        self._compact()
+        count = len(pcm) // 2
+        self.samples[self.size:self.size + count] = np.frombuffer(pcm, dtype=np.int16, count=count) / 32768.0
+        self.size += count
+
+    def window(self, final=False):
+        # Returns (start seconds, samples), cutting at the quietest point near the end
+        self._compact()
+        if final:
+            cut = self.size
+        else:
+            search_from = max(self.size // 2, self.size - int(CUT_SEARCH_SECONDS * self.sample_rate))
+            cut = quietest_point(self.samples[:self.size], search_from)
+        self.pending_cut = cut
+        return self.offset / self.sample_rate, self.samples[:cut]
+
+
+def iter_audio_windows(file_path, window_seconds=WINDOW_SECONDS):
+    import ffmpeg
+    process = (
+        ffmpeg.input(file_path)
+        .output('pipe:', format='s16le', acodec='pcm_s16le', ac=1, ar=SAMPLE_RATE, loglevel='quiet')
+        .run_async(pipe_stdout=True)
+    )
+    buffer = AudioWindowBuffer(window_seconds)
+    frame_bytes = int(READ_FRAME_SECONDS * SAMPLE_RATE) * 2
+    try:
+        while True:
+            pcm = process.stdout.read(min(frame_bytes, buffer.free() * 2))
+            if not pcm:
+                break
+            buffer.write(pcm)
+            if buffer.free() == 0:
+                yield buffer.window()
+        if buffer.size:
+            yield buffer.window(final=True)
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode audio from {file_path}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+
+def transcribe_stream(file_path, transcribe_window, window_seconds=WINDOW_SECONDS):
+    # transcribe_window(audio) returns segments with start/end relative to the
+    # window; they are shifted to absolute times here. Each window must be fully
+    # consumed before the next one is read because the buffer is reused.
+    for start, audio in iter_audio_windows(file_path, window_seconds):
+        for segment in transcribe_window(audio):
+            yield shift_segment(segment, start)
+
+
+def shift_segment(segment, offset):
+    shifted = {**segment, 'start': segment['start'] + offset, 'end': segment['end'] + offset}
+    if segment.get('words'):
+        shifted['words'] = [{**word, 'start': word['start'] + offset, 'end': word['end'] + offset}
+                            for word in segment['words']]
+    return shifted
+
+
+def faster_whisper_segments(model, audio, **options):
+    # Confidence is the segment's mean token probability; words are only present
+    # when the caller asked for word_timestamps
+    segments, info = model.transcribe(audio, **options)
+    return [
+        {
+            'start': s.start,
+            'end': s.end,
+            'text': s.text,
+            'confidence': round(math.exp(s.avg_logprob), 3),
+            'words': [{'start': w.start, 'end': w.end, 'word': w.word, 'probability': w.probability}
+                      for w in s.words] if s.words else None,
+        }
+        for s in segments
+    ]
+
+
+# Parallel transcription: the stream is cut into silence-aligned chunks that are
+# decoded by a pool of worker processes, each holding its own copy of the model
+CHUNK_SECONDS = int(os.environ.get('TRANSCRIBE_CHUNK_SECONDS', 120))
+CHUNK_OVERLAP_SECONDS = 2
+THREADS_PER_PROCESS = 4
+
+_pool = None
+_pool_config = None
+_pool_lock = threading.Lock()
+
+
+def default_processes(backend):
+    if backend['device'] == 'cuda':
+        return 1
+    return max(1, (os.cpu_count() or 1) // THREADS_PER_PROCESS)
+
+
+def _worker_backend(backend, processes):
+    return {**backend, 'cpu_threads': max(1, (os.cpu_count() or 1) // processes), 'num_workers': 1}
+
+
+def _transcription_pool(size, backend, processes):
+    global _pool, _pool_config
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    config = (size, tuple(sorted(backend.items())), processes)
+    with _pool_lock:
+        if _pool is None or _pool_config != config:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            worker = _worker_backend(backend, processes)
+            # spawn rather than fork: the parent is a threaded web server
+            _pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=preload_model,
+                initargs=(size, worker['device'], worker['compute_type'], worker['backend'],
+                          worker['cpu_threads'], worker['num_workers'])
+            )
+            _pool_config = config
+        return _pool
+
+
+def _transcribe_chunk(offset, audio, size, backend, options):
+    with use_model(size, **backend) as model:
+        return [shift_segment(segment, offset) for segment in faster_whisper_segments(model, audio, **options)]
+
+
+def _normalize_text(text):
+    return ' '.join(text.lower().split())
+
+
+def stitch_segments(chunks, tolerance=0.2):
+    # Chunks overlap by a couple of seconds; drop segments the previous chunk
+    # already covered so the boundaries don't repeat words
+    last = None
+    for segments in chunks:
+        for segment in segments:
+            if last is not None:
+                if segment['end'] <= last['end'] + tolerance:
+                    continue
+                if (segment['start'] + segment['end']) / 2 < last['end']:
+                    continue
+                if _normalize_text(segment['text']) == _normalize_text(last['text']):
+                    continue
+            yield segment
+            last = segment
+
+
+def _chunk_results(file_path, size, backend, processes, chunk_seconds, overlap, options):
+    import numpy as np
+    from collections import deque
+    pool = _transcription_pool(size, backend, processes)
+    worker = _worker_backend(backend, processes)
+    pending = deque()
+    tail = np.empty(0, dtype=np.float32)
+    try:
+        for start, audio in iter_audio_windows(file_path, chunk_seconds):
+            # Prepend the end of the previous chunk so words on the cut aren't lost
+            chunk = np.concatenate([tail, audio])
+            offset = start - len(tail) / SAMPLE_RATE
+            tail = audio[max(0, len(audio) - int(overlap * SAMPLE_RATE)):].copy()
+            pending.append(pool.submit(_transcribe_chunk, offset, chunk, size, worker, options))
+            # Keep at most two chunks per worker in flight so memory stays bounded
+            while len(pending) >= processes * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def transcribe_file(file_path, size, backend, processes=1, chunk_seconds=CHUNK_SECONDS,
+                    overlap=CHUNK_OVERLAP_SECONDS, **options):
+    if processes <= 1:
+        with use_model(size, **backend) as model:
+            yield from transcribe_stream(file_path, lambda audio: faster_whisper_segments(model, audio, **options))
+        return
+    yield from stitch_segments(_chunk_results(file_path, size, backend, processes, chunk_seconds, overlap, options))
+
+
+def preload_transcriber(size, backend, processes=1):
+    if processes <= 1:
+        return preload_model(size, **backend)
+    # Workers are spawned on demand; one trivial task each starts them all now
+    pool = _transcription_pool(size, backend, processes)
+    for _ in range(processes):
+        pool.submit(os.getpid)
+    return True
+
+
+def media_duration(file_path):
+    import ffmpeg
+    try:
+        return float(ffmpeg.probe(file_path)['format']['duration'])
+    except Exception as e:
+        print(f"Could not read duration of {file_path}: {e}")
+        return None
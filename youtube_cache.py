@@ -0,0 +1,72 @@
+import os
+import re
+import time
+
+from sqlalchemy import text
+
+import blob_store
+
+# Processed YouTube videos (transcript, language, summary) shared by every user who submits
+# the same id, one entry per transcription language. Concurrent jobs for one id are
+# coalesced by single_flight, keyed "youtube:<id>:<language>"
+YOUTUBE_CACHE_TTL = int(os.environ.get('YOUTUBE_CACHE_TTL', 7 * 86400))
+
+VIDEO_ID = re.compile(r'(?:[?&]v=|/shorts/|/embed/|/live/|youtu\.be/)([A-Za-z0-9_-]{11})')
+
+
+def video_id(url):
+    match = VIDEO_ID.search(url or '')
+    return match.group(1) if match else None
+
+
+def create_table(conn):
+    conn.execute(text('''
+    CREATE TABLE IF NOT EXISTS youtube_cache (
+        youtube_id VARCHAR(50) NOT NULL,
+        language VARCHAR(10) NOT NULL,
+        model VARCHAR(50) NOT NULL,
+        word_timestamps BOOLEAN NOT NULL DEFAULT 0,
+        title VARCHAR(200),
+        codec VARCHAR(10),
+        segments BLOB,
+        summary TEXT,
+        playable_in_embed BOOLEAN,
+        video_path VARCHAR(200),
+        fetched_at REAL,
+        last_access DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (youtube_id, language)
+    )
+    '''))
+
+
+def lookup(conn, youtube_id, model, language, word_timestamps=False):
+    # An entry with word timings also serves requests that don't need them
+    row = conn.execute(text('''
+    SELECT title, language, codec, segments, summary, playable_in_embed, video_path
+    FROM youtube_cache
+    WHERE youtube_id = :id AND language = :language AND model = :model AND word_timestamps >= :word_timestamps
+      AND segments IS NOT NULL AND fetched_at >= :fresh_after
+    '''), {'id': youtube_id, 'language': language, 'model': model, 'word_timestamps': word_timestamps,
+          'fresh_after': time.time() - YOUTUBE_CACHE_TTL}).mappings().fetchone()
+    if not row:
+        return None
+    conn.execute(text("UPDATE youtube_cache SET last_access = CURRENT_TIMESTAMP WHERE youtube_id = :id AND language = :language"),
+                 {'id': youtube_id, 'language': language})
+    conn.commit()
+    entry = dict(row)
+    entry['segments'] = blob_store.decompress(entry.pop('codec'), entry['segments'])
+    return entry
+
+
+def store(conn, youtube_id, model, title, language, segments, summary, playable_in_embed, video_path,
+          word_timestamps=False):
+    codec, data = blob_store.compress(segments)
+    conn.execute(text('''
+    INSERT OR REPLACE INTO youtube_cache
+        (youtube_id, model, word_timestamps, title, language, codec, segments, summary, playable_in_embed,
+         video_path, fetched_at)
+    VALUES (:id, :model, :word_timestamps, :title, :language, :codec, :segments, :summary, :playable_in_embed,
+            :video_path, :now)
+    '''), {'id': youtube_id, 'model': model, 'word_timestamps': word_timestamps, 'title': title, 'language': language, 'codec': codec, 'segments': data,
+          'summary': summary, 'playable_in_embed': playable_in_embed, 'video_path': video_path, 'now': time.time()})
+